@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Minimum cosine similarity between two query embeddings to reuse an answer; strict
+# because questions differing in one detail ("set 3" vs "set 4") still score ~0.95
+DEFAULT_SIMILARITY_THRESHOLD = 0.98
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 3600
+
+
+def prompt_hash(*parts: Optional[str]) -> str:
+    """Stable hash of the system prompt (and anything else shaping the answer)"""
+    return hashlib.sha256("\x00".join(part or "" for part in parts).encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache of RAG answers looked up by query embedding similarity
+
+    An entry is reused when its query embedding is within similarity_threshold
+    (cosine) of the new query and it was produced with the same prompt hash
+    and corpus version (kept in the document catalog, see
+    DocumentCatalog.bump_version). A new corpus version makes older entries
+    unreachable; they age out through the LRU and TTL.
+    """
+
+    def __init__(self,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self, now: float) -> None:
+        expired = [entry_id for entry_id, entry in self._entries.items()
+                   if now - entry["created_at"] > self.ttl_seconds]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def lookup(self, query_vector, prompt_key: str, version: str) -> Optional[Dict[str, Any]]:
+        """Return the cached {"answer", "sources"} closest to the query, or None"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        with self._lock:
+            self._expire(time.time())
+            candidates = [(entry_id, entry) for entry_id, entry in self._entries.items()
+                          if entry["prompt_key"] == prompt_key and entry["version"] == version
+                          and entry["vector"].shape == query.shape]
+            if candidates:
+                scores = np.stack([entry["vector"] for _, entry in candidates]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return {"answer": entry["answer"], "sources": entry["sources"], "similarity": float(scores[best])}
+            self.misses += 1
+            return None
+
+    def store(self, query_vector, prompt_key: str, version: str, answer: str, sources: List[Dict[str, Any]]) -> None:
+        """Cache an answer for a query embedding"""
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1)
+
+        with self._lock:
+            self._entries[self._next_id] = {
+                "vector": vector,
+                "prompt_key": prompt_key,
+                "version": version,
+                "answer": answer,
+                "sources": sources,
+                "created_at": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "similarity_threshold": self.similarity_threshold,
+            }
+
+
+def answer_cache_from_env() -> Optional[SemanticAnswerCache]:
+    """Answer cache configured by ANSWER_CACHE* variables, or None if ANSWER_CACHE=off"""
+    if os.getenv("ANSWER_CACHE", "on").lower() in ("0", "off", "false"):
+        return None
+    return SemanticAnswerCache(
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", DEFAULT_SIMILARITY_THRESHOLD)),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", DEFAULT_TTL_SECONDS))
+    )
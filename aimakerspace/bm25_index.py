@@ -0,0 +1,184 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Lowercased alphanumeric runs: "EMOM 21-15-9" -> ["emom", "21", "15", "9"]
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Standard BM25 parameters: term frequency saturation and length normalization
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+# Directory of the persisted indexes, one JSON file per collection (BM25_INDEX_DIR overrides it);
+# read-only deploys such as Vercel fall back to the temp dir
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "bm25_data")
+FALLBACK_INDEX_DIR = os.path.join(tempfile.gettempdir(), "bm25_data")
+
+# Process-wide indexes shared by the document processor and the query engine
+_indexes: Dict[str, "BM25Index"] = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """In-process BM25 inverted index over chunk texts, keyed by Qdrant point id
+
+    Postings map each term to {point_id: term frequency}; document lengths and
+    the file_id of every chunk are kept so a whole PDF can be removed. The
+    index is persisted as JSON with an atomic replace; if the directory is not
+    writable it stays in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._file_ids: Dict[str, Optional[str]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_ids: Iterable, texts: Iterable[str], file_ids: Optional[Iterable[Optional[str]]] = None) -> None:
+        """Index (or re-index) chunks"""
+        doc_ids = [str(doc_id) for doc_id in doc_ids]
+        file_ids = list(file_ids) if file_ids is not None else [None] * len(doc_ids)
+        with self._lock:
+            self.remove(doc_ids)
+            for doc_id, text, file_id in zip(doc_ids, texts, file_ids):
+                terms = Counter(tokenize(text))
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+                length = sum(terms.values())
+                self._lengths[doc_id] = length
+                self._file_ids[doc_id] = file_id
+                self._total_length += length
+
+    def remove(self, doc_ids: Iterable) -> int:
+        """Drop chunks from the index, returning how many were present"""
+        removed = 0
+        with self._lock:
+            for doc_id in map(str, doc_ids):
+                length = self._lengths.pop(doc_id, None)
+                if length is None:
+                    continue
+                self._file_ids.pop(doc_id, None)
+                self._total_length -= length
+                removed += 1
+            if removed:
+                # Rebuilding the touched postings is simpler than storing each chunk's terms
+                gone = set(map(str, doc_ids))
+                for term in list(self._postings):
+                    postings = self._postings[term]
+                    for doc_id in gone.intersection(postings):
+                        del postings[doc_id]
+                    if not postings:
+                        del self._postings[term]
+        return removed
+
+    def remove_file(self, file_id: str) -> int:
+        """Drop every chunk of one PDF"""
+        with self._lock:
+            return self.remove([doc_id for doc_id, owner in self._file_ids.items() if owner == file_id])
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (point_id, BM25 score) for a query"""
+        with self._lock:
+            n_docs = len(self._lengths)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            temp_path = None
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                # A unique temp file per save, replaced under the lock, so concurrent saves cannot collide
+                fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "k1": self.k1,
+                        "b": self.b,
+                        "lengths": self._lengths,
+                        "file_ids": self._file_ids,
+                        "postings": self._postings
+                    }, f)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"Could not save BM25 index to {self.path} ({e}); keeping it in memory only")
+                if temp_path is not None and os.path.exists(temp_path):
+                    os.remove(temp_path)
+                self.path = None
+
+    def load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self.k1 = data.get("k1", self.k1)
+            self.b = data.get("b", self.b)
+            self._lengths = data["lengths"]
+            self._file_ids = data["file_ids"]
+            self._postings = data["postings"]
+            self._total_length = sum(self._lengths.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings, self._lengths, self._file_ids = {}, {}, {}
+            self._total_length = 0
+
+
+def index_dir() -> str:
+    """BM25_INDEX_DIR, else the repo's bm25_data if writable, else a temp dir"""
+    if os.getenv("BM25_INDEX_DIR"):
+        return os.getenv("BM25_INDEX_DIR")
+    existing = DEFAULT_INDEX_DIR if os.path.isdir(DEFAULT_INDEX_DIR) else os.path.dirname(DEFAULT_INDEX_DIR)
+    return DEFAULT_INDEX_DIR if os.access(existing, os.W_OK) else FALLBACK_INDEX_DIR
+
+
+def get_bm25_index(vector_store) -> Optional[BM25Index]:
+    """Shared lexical index for a QdrantVectorStore's collection, or None if BM25_INDEX=off
+
+    An index whose chunk count differs from the collection's (missing after
+    a deploy with an ephemeral disk, or stale after changes by another
+    instance) is rebuilt from the stored chunks.
+    """
+    if os.getenv("BM25_INDEX", "on").lower() in ("0", "off", "false"):
+        return None
+    collection_name = vector_store.collection_name
+    with _indexes_lock:
+        index = _indexes.get(collection_name)
+        if index is None:
+            index = BM25Index(path=os.path.join(index_dir(), f"{collection_name}.json"))
+            if len(index) != vector_store.client.count(collection_name, exact=True).count:
+                print(f"Building BM25 index for '{collection_name}'")
+                index.clear()
+                for ids, texts, file_ids in vector_store.iter_chunks():
+                    index.add(ids, texts, file_ids)
+                index.save()
+            _indexes[collection_name] = index
+        return index
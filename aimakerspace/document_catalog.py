@@ -0,0 +1,167 @@
+import time
+import uuid
+from typing import List, Dict, Any, Optional
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+# Suffix appended to a chunk collection's name to get its catalog collection
+CATALOG_SUFFIX = "_catalog"
+# Catalog fields looked up by value (upload deduplication)
+INDEXED_FIELDS = ("content_hash", "filename")
+# Reserved catalog point holding the corpus version shared by every process
+VERSION_POINT_ID = str(uuid.uuid5(uuid.NAMESPACE_URL, "catalog:corpus_version"))
+# Filter excluding the version point from record listings and counts
+RECORDS_FILTER = models.Filter(must_not=[models.HasIdCondition(has_id=[VERSION_POINT_ID])])
+
+
+class DocumentCatalog:
+    """One record per uploaded PDF, stored in a small vectorless Qdrant collection
+
+    Each record holds the file_id, display filename, content hash, chunk count,
+    status and created/updated timestamps, so listing documents costs
+    O(documents) instead of scrolling every chunk. A reserved point holds the
+    corpus version, a token replaced whenever the document set changes, so
+    every process sharing the collection sees the same version.
+    """
+
+    def __init__(self, client: QdrantClient, collection_name: str):
+        self.client = client
+        self.collection_name = collection_name
+        self._create_collection_if_not_exists()
+
+    def _create_collection_if_not_exists(self):
+        """Create the catalog collection (payload only, no vectors) if it doesn't exist"""
+        collections = self.client.get_collections().collections
+        if self.collection_name not in [collection.name for collection in collections]:
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config={}
+            )
+
+        # Keyword indexes for the hash and filename lookups
+        payload_schema = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field in INDEXED_FIELDS:
+            if field not in payload_schema:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field,
+                    field_schema=models.PayloadSchemaType.KEYWORD
+                )
+
+    def _find(self, field: str, value: str) -> List[Dict[str, Any]]:
+        points, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=models.Filter(
+                must=[models.FieldCondition(key=field, match=models.MatchValue(value=value))]
+            ),
+            limit=16,
+            with_payload=True,
+            with_vectors=False
+        )
+        return [point.payload for point in points]
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return a completed document with this content hash, if any"""
+        for record in self._find("content_hash", content_hash):
+            if record.get("status") == "completed":
+                return record
+        return None
+
+    def find_by_filename(self, filename: str) -> List[Dict[str, Any]]:
+        """Return the documents uploaded under this filename"""
+        return self._find("filename", filename)
+
+    @staticmethod
+    def _point_id(file_id: str) -> str:
+        # Qdrant ids must be UUIDs or integers, file_ids are arbitrary strings
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"document:{file_id}"))
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Return the record for a file_id, or None"""
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[self._point_id(file_id)],
+            with_payload=True
+        )
+        return records[0].payload if records else None
+
+    def upsert(self,
+               file_id: str,
+               filename: str,
+               num_chunks: int = 0,
+               content_hash: Optional[str] = None,
+               status: str = "completed",
+               **extra: Any) -> Dict[str, Any]:
+        """Create or update a document record, keeping its original created_at"""
+        existing = self.get(file_id) or {}
+        now = time.time()
+        record = {
+            **existing,
+            **extra,
+            "file_id": file_id,
+            "filename": filename,
+            "num_chunks": num_chunks,
+            "content_hash": content_hash if content_hash is not None else existing.get("content_hash"),
+            "status": status,
+            "created_at": existing.get("created_at", now),
+            "updated_at": now,
+        }
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[models.PointStruct(id=self._point_id(file_id), vector={}, payload=record)]
+        )
+        return record
+
+    def delete(self, file_id: str) -> None:
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=[self._point_id(file_id)])
+        )
+
+    @staticmethod
+    def version_from(points) -> str:
+        """Corpus version stored in the retrieved version point ("" if never bumped)"""
+        return points[0].payload.get("corpus_version", "") if points else ""
+
+    def version(self) -> str:
+        """Current corpus version; cached answers are only valid for the same version"""
+        return self.version_from(self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[VERSION_POINT_ID],
+            with_payload=True
+        ))
+
+    def bump_version(self) -> str:
+        """Mark the document set as changed, invalidating cached answers in every process"""
+        version = uuid.uuid4().hex
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[models.PointStruct(id=VERSION_POINT_ID, vector={}, payload={"corpus_version": version})]
+        )
+        return version
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Return every document record"""
+        records = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=RECORDS_FILTER,
+                limit=256,
+                with_payload=True,
+                with_vectors=False,
+                offset=offset
+            )
+            records.extend(point.payload for point in points)
+            if offset is None:
+                break
+        return records
+
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection_name, count_filter=RECORDS_FILTER, exact=True).count
+
+    def clear(self) -> None:
+        """Drop and recreate the catalog collection"""
+        self.client.delete_collection(collection_name=self.collection_name)
+        self._create_collection_if_not_exists()
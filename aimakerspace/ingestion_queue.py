@@ -0,0 +1,131 @@
+import queue
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_NUM_WORKERS = 2
+DEFAULT_MAX_QUEUE_SIZE = 16
+# Finished jobs kept around for status/timing lookups
+MAX_FINISHED_JOBS = 1000
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the ingestion queue is at capacity"""
+
+
+class IngestionQueue:
+    """Bounded job queue served by a fixed pool of worker threads
+
+    Ingestion jobs (PDF parsing, embedding, upserts) run on these workers
+    instead of the web server's event loop. Submitting to a full queue raises
+    QueueFullError so callers can apply backpressure, and every job records
+    its queue wait and run time.
+    """
+
+    def __init__(self,
+                 handler: Callable[..., Any],
+                 num_workers: int = DEFAULT_NUM_WORKERS,
+                 max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE):
+        self.handler = handler
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._workers = []
+
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._work, name=f"ingestion-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job_id: str, *args, **kwargs) -> Dict[str, Any]:
+        """Queue handler(*args, **kwargs) under job_id, or raise QueueFullError"""
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "queued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "wait_seconds": None,
+            "run_seconds": None,
+            "error": None,
+        }
+        with self._lock:
+            try:
+                self._queue.put_nowait((job, args, kwargs))
+            except queue.Full:
+                raise QueueFullError(
+                    f"Ingestion queue is full ({self.max_queue_size} jobs waiting)"
+                )
+            self._jobs[job_id] = job
+        return dict(job)
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, args, kwargs = item
+
+            with self._lock:
+                self._active += 1
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                job["wait_seconds"] = job["started_at"] - job["queued_at"]
+
+            try:
+                self.handler(*args, **kwargs)
+                status, error = "completed", None
+            except Exception as e:
+                traceback.print_exc()
+                status, error = "failed", str(e)
+
+            with self._lock:
+                self._active -= 1
+                job["status"] = status
+                job["error"] = error
+                job["finished_at"] = time.time()
+                job["run_seconds"] = job["finished_at"] - job["started_at"]
+                if status == "completed":
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._trim_finished()
+            print(f"Ingestion job {job['job_id']} {status}: waited {job['wait_seconds']:.2f}s, ran {job['run_seconds']:.2f}s")
+
+    def _trim_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Timing and status of a queued, running or recently finished job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and worker utilisation counters"""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "workers": self.num_workers,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers after the jobs already queued have run"""
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -0,0 +1,174 @@
+import numpy as np
+from typing import List, Optional
+
+# Default number of inverted lists probed per query
+DEFAULT_NPROBE = 8
+# Training sample size per inverted list (k-means runs on a sample, not on every row)
+TRAIN_SAMPLES_PER_LIST = 64
+# Rows scored per matrix multiply when assigning vectors to lists
+ASSIGN_BLOCK_SIZE = 16384
+# Initial capacity of an inverted list; lists double when full
+INITIAL_LIST_CAPACITY = 16
+
+
+class IVFIndex:
+    """Inverted-file ANN index over the rows of a normalized vector matrix
+
+    A spherical k-means coarse quantizer splits the vectors into nlist lists.
+    A query scores only the rows of its nprobe closest lists, trading recall
+    (raise nprobe) for speed (lower nprobe). Each list holds its row numbers,
+    so a query only concatenates the probed lists; the list id and position of
+    every row are kept so VectorDatabase can add, remove and move rows in O(1).
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = DEFAULT_NPROBE,
+                 max_iter: int = 20, seed: int = 0):
+        self.nlist = nlist
+        # None lets every (re)training pick sqrt(rows) lists
+        self.requested_nlist = nlist
+        self.nprobe = nprobe
+        self.max_iter = max_iter
+        self.seed = seed
+        self.centroids = None
+        self.trained_rows = 0
+        # Per row: its list id (-1 if unassigned) and its position inside that list
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._positions = np.empty(0, dtype=np.int64)
+        self._lists: List[np.ndarray] = []
+        self._sizes = np.empty(0, dtype=np.int64)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def min_train_size(self) -> int:
+        """Rows needed before training is worthwhile"""
+        return max(1024, (self.requested_nlist or 32) * 16)
+
+    def train(self, matrix: np.ndarray) -> None:
+        """Fit the coarse quantizer with spherical k-means and assign every row"""
+        rng = np.random.default_rng(self.seed)
+        n_rows = matrix.shape[0]
+        nlist = self.requested_nlist or max(1, int(np.sqrt(n_rows)))
+        nlist = min(nlist, n_rows)
+
+        sample_size = min(n_rows, nlist * TRAIN_SAMPLES_PER_LIST)
+        sample = np.asarray(matrix[rng.choice(n_rows, sample_size, replace=False)], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.max_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+
+            # Re-seed empty lists with random sample points
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            new_centroids = sums / np.where(norms == 0, 1, norms)
+            converged = np.allclose(new_centroids, centroids, atol=1e-4)
+            centroids = new_centroids
+            if converged:
+                break
+
+        self.nlist = nlist
+        self.centroids = centroids.astype(np.float32)
+        self._build_lists(self.assign(matrix))
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """List id of each (normalized) vector"""
+        labels = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], ASSIGN_BLOCK_SIZE):
+            block = vectors[start:start + ASSIGN_BLOCK_SIZE]
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def _build_lists(self, assignments: np.ndarray) -> None:
+        """Group rows by list id in one pass"""
+        n_rows = len(assignments)
+        self._assignments = np.array(assignments, dtype=np.int32)
+        self._positions = np.empty(n_rows, dtype=np.int64)
+        order = np.argsort(self._assignments, kind="stable")
+        counts = np.bincount(self._assignments, minlength=self.nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self._positions[order] = np.arange(n_rows) - np.repeat(starts, counts)
+        self._lists = [
+            np.concatenate((order[start:start + count], np.empty(max(INITIAL_LIST_CAPACITY, count), dtype=np.int64)))
+            for start, count in zip(starts, counts)
+        ]
+        self._sizes = counts.astype(np.int64)
+        self.trained_rows = n_rows
+
+    def _append(self, row: int, list_id: int) -> None:
+        size = self._sizes[list_id]
+        if size == len(self._lists[list_id]):
+            grown = np.empty(max(INITIAL_LIST_CAPACITY, size * 2), dtype=np.int64)
+            grown[:size] = self._lists[list_id][:size]
+            self._lists[list_id] = grown
+        self._lists[list_id][size] = row
+        self._positions[row] = size
+        self._assignments[row] = list_id
+        self._sizes[list_id] = size + 1
+
+    def _unlink(self, row: int) -> None:
+        """Drop a row from its list by moving the list's last entry into its place"""
+        list_id = self._assignments[row]
+        position = self._positions[row]
+        last = self._sizes[list_id] - 1
+        last_row = self._lists[list_id][last]
+        self._lists[list_id][position] = last_row
+        self._positions[last_row] = position
+        self._sizes[list_id] = last
+        self._assignments[row] = -1
+
+    def set_rows(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Record the list of newly written rows"""
+        if not self.trained or len(rows) == 0:
+            return
+        needed = int(rows.max()) + 1
+        if needed > len(self._assignments):
+            capacity = max(needed, len(self._assignments) * 2)
+            assignments = np.full(capacity, -1, dtype=np.int32)
+            assignments[: len(self._assignments)] = self._assignments
+            positions = np.zeros(capacity, dtype=np.int64)
+            positions[: len(self._positions)] = self._positions
+            self._assignments, self._positions = assignments, positions
+        for row, list_id in zip(rows, self.assign(vectors)):
+            if self._assignments[row] >= 0:
+                self._unlink(row)
+            self._append(row, list_id)
+
+    def remove_row(self, row: int) -> None:
+        """Forget a deleted row"""
+        if self.trained and row < len(self._assignments) and self._assignments[row] >= 0:
+            self._unlink(row)
+
+    def move_row(self, src: int, dst: int) -> None:
+        """Renumber row src as dst (dst must already be removed)"""
+        if not self.trained or self._assignments[src] < 0:
+            return
+        list_id = self._assignments[src]
+        position = self._positions[src]
+        self._lists[list_id][position] = dst
+        self._positions[dst] = position
+        self._assignments[dst] = list_id
+        self._assignments[src] = -1
+
+    def candidate_rows(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows of the nprobe lists closest to the query"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[probe][: self._sizes[probe]] for probe in probes])
+
+    def state(self, n_rows: int):
+        """Arrays needed to persist the trained index"""
+        return self.centroids, self._assignments[:n_rows]
+
+    def restore(self, centroids: np.ndarray, assignments: np.ndarray) -> None:
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.nlist = self.centroids.shape[0]
+        self._build_lists(assignments)
@@ -0,0 +1,116 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import openai
+
+from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.openai_utils.tokens import count_tokens
+
+# Request limits for the embeddings endpoint (OpenAI allows 2048 inputs / 300k tokens)
+DEFAULT_MAX_BATCH_ITEMS = 256
+DEFAULT_MAX_BATCH_TOKENS = 100_000
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+# Errors worth retrying: rate limits and transient transport failures
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class EmbeddingBatcher:
+    """Packs texts into well-sized embedding requests and runs them concurrently.
+
+    Batches are bounded both by item count and by an estimated token budget, at
+    most `concurrency` batches are in flight at once, and rate-limit errors are
+    retried with exponential backoff and jitter.
+    """
+
+    def __init__(self,
+                 embedding_model: EmbeddingModel,
+                 max_batch_items: int = DEFAULT_MAX_BATCH_ITEMS,
+                 max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_seconds: float = DEFAULT_BACKOFF_SECONDS):
+        self.embedding_model = embedding_model
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Group text indices into batches that respect the item and token limits"""
+        batches = []
+        current = []
+        current_tokens = 0
+        model_name = self.embedding_model.embeddings_model_name
+
+        for i, text in enumerate(texts):
+            tokens = count_tokens(text, model_name)
+            if current and (len(current) >= self.max_batch_items
+                            or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+
+    async def _aembed_batch(self, texts: List[str], semaphore: asyncio.Semaphore) -> List[List[float]]:
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await self.embedding_model.async_get_embeddings(texts)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt)
+                    print(f"Embedding batch of {len(texts)} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embedding_model.get_embeddings(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Embedding batch of {len(texts)} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts asynchronously, returning vectors in input order"""
+        batches = self.make_batches(texts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*[
+            self._aembed_batch([texts[i] for i in batch], semaphore) for batch in batches
+        ])
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts from synchronous code using a small thread pool"""
+        batches = self.make_batches(texts)
+        if len(batches) <= 1 or self.concurrency <= 1:
+            results = [self._embed_batch([texts[i] for i in batch]) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                results = list(executor.map(
+                    lambda batch: self._embed_batch([texts[i] for i in batch]), batches
+                ))
+        return [vector for batch_vectors in results for vector in batch_vectors]
@@ -1,14 +1,15 @@
-from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from typing import Optional
 import os
+from aimakerspace.openai_utils.clients import client_session, async_client_session
 
 load_dotenv()
 
 
 class ChatOpenAI:
-    def __init__(self, model_name: str = "gpt-4o-mini"):
+    def __init__(self, model_name: str = "gpt-4o-mini", api_key: Optional[str] = None):
         self.model_name = model_name
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_api_key = api_key or os.getenv("OPENAI_API_KEY")
         if self.openai_api_key is None:
             raise ValueError("OPENAI_API_KEY is not set")
 
@@ -16,10 +17,25 @@ class ChatOpenAI:
         if not isinstance(messages, list):
             raise ValueError("messages must be a list")
 
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model=self.model_name, messages=messages, **kwargs
-        )
+        with client_session(self.openai_api_key) as client:
+            response = client.chat.completions.create(
+                model=self.model_name, messages=messages, **kwargs
+            )
+
+        if text_only:
+            return response.choices[0].message.content
+
+        return response
+
+    async def arun(self, messages, text_only: bool = True, **kwargs):
+        """Like run, but awaits the completion on the async client"""
+        if not isinstance(messages, list):
+            raise ValueError("messages must be a list")
+
+        async with async_client_session(self.openai_api_key) as client:
+            response = await client.chat.completions.create(
+                model=self.model_name, messages=messages, **kwargs
+            )
 
         if text_only:
             return response.choices[0].message.content
@@ -30,16 +46,21 @@ class ChatOpenAI:
         if not isinstance(messages, list):
             raise ValueError("messages must be a list")
         
-        client = AsyncOpenAI()
-
-        stream = await client.chat.completions.create(
-            model=self.model_name,
-            messages=messages,
-            stream=True,
-            **kwargs
-        )
-
-        async for chunk in stream:
-            content = chunk.choices[0].delta.content
-            if content is not None:
-                yield content
+        async with async_client_session(self.openai_api_key) as client:
+            stream = await client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                stream=True,
+                **kwargs
+            )
+
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content is not None:
+                        yield content
+            finally:
+                # Release the HTTP connection when the consumer stops early (e.g. client disconnect)
+                await stream.close()
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+# Connection pool limits shared by every request to one OpenAI endpoint
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+# Idle connections are kept open this long, so follow-up calls skip the TLS handshake
+KEEPALIVE_EXPIRY_SECONDS = 60.0
+CONNECT_TIMEOUT_SECONDS = 5.0
+REQUEST_TIMEOUT_SECONDS = 60.0
+# Connections of a short-lived client built for a key supplied with a request
+SESSION_MAX_CONNECTIONS = 2
+
+# Only the server's own key (OPENAI_API_KEY) is pooled: one client per (key, base URL);
+# async clients are additionally per event loop, because their connection pool is
+# bound to the loop it was first used on
+_clients: Dict[Tuple[Optional[str], Optional[str]], OpenAI] = {}
+_async_clients = weakref.WeakKeyDictionary()
+_no_loop_async_clients: Dict[Tuple[Optional[str], Optional[str]], AsyncOpenAI] = {}
+_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+
+
+def is_server_key(api_key: Optional[str]) -> bool:
+    """Whether api_key is the server's OPENAI_API_KEY (None means the server's key)"""
+    return api_key is None or api_key == os.getenv("OPENAI_API_KEY")
+
+
+def _key(api_key: Optional[str], base_url: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    if not is_server_key(api_key):
+        # Pooling arbitrary keys would keep every caller's secret and connections alive forever
+        raise ValueError("Only the server's OPENAI_API_KEY is pooled; use client_session for other keys")
+    return (os.getenv("OPENAI_API_KEY"), base_url or os.getenv("OPENAI_BASE_URL"))
+
+
+def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+    """Process-wide pooled OpenAI client for the server's key and this base URL"""
+    key = _key(api_key, base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=key[0],
+                base_url=key[1],
+                timeout=_timeout(),
+                http_client=DefaultHttpxClient(limits=_limits())
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """Pooled AsyncOpenAI client for the server's key and this base URL on the running event loop"""
+    key = _key(api_key, base_url)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _lock:
+        # Clients of closed loops can never be used again
+        for closed in [other for other in _async_clients if other.is_closed()]:
+            del _async_clients[closed]
+        clients = _no_loop_async_clients if loop is None else _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=key[0],
+                base_url=key[1],
+                timeout=_timeout(),
+                http_client=DefaultAsyncHttpxClient(limits=_limits())
+            )
+            clients[key] = client
+        return client
+
+
+def _session_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=SESSION_MAX_CONNECTIONS, max_keepalive_connections=0)
+
+
+@contextmanager
+def client_session(api_key: Optional[str] = None, base_url: Optional[str] = None) -> Iterator[OpenAI]:
+    """Client for one call: the pooled one for the server's key, otherwise a
+    private client that is closed on exit, so keys sent with a request are
+    never retained"""
+    if is_server_key(api_key):
+        yield get_client(base_url=base_url)
+        return
+    client = OpenAI(
+        api_key=api_key,
+        base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+        timeout=_timeout(),
+        http_client=DefaultHttpxClient(limits=_session_limits())
+    )
+    try:
+        yield client
+    finally:
+        client.close()
+
+
+@asynccontextmanager
+async def async_client_session(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncIterator[AsyncOpenAI]:
+    """Async counterpart of client_session"""
+    if is_server_key(api_key):
+        yield get_async_client(base_url=base_url)
+        return
+    client = AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+        timeout=_timeout(),
+        http_client=DefaultAsyncHttpxClient(limits=_session_limits())
+    )
+    try:
+        yield client
+    finally:
+        await client.close()
@@ -1,52 +1,136 @@
 from dotenv import load_dotenv
-from openai import AsyncOpenAI, OpenAI
+from openai import AsyncOpenAI
 import openai
-from typing import List
+from typing import List, Optional
 import os
 import asyncio
+from aimakerspace.openai_utils.embedding_cache import EmbeddingCache
+from aimakerspace.openai_utils.clients import get_client, get_async_client
+
+# Process-wide cache shared by every EmbeddingModel that does not bring its own
+_default_cache = None
+
+# Native output size of the OpenAI embedding models
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+DEFAULT_DIMENSION = 1536
+
+
+def get_default_cache() -> Optional[EmbeddingCache]:
+    """Return the shared embedding cache, or None if EMBEDDING_CACHE=off"""
+    global _default_cache
+    if os.getenv("EMBEDDING_CACHE", "on").lower() in ("0", "off", "false"):
+        return None
+    if _default_cache is None:
+        cache_path = os.getenv("EMBEDDING_CACHE_PATH")
+        _default_cache = EmbeddingCache(path=cache_path) if cache_path else EmbeddingCache()
+    return _default_cache
 
 
 class EmbeddingModel:
-    def __init__(self, embeddings_model_name: str = "text-embedding-3-small"):
+    """OpenAI embeddings with a shared cache in front of the API
+
+    `dimensions` (or EMBEDDING_DIMENSIONS) asks text-embedding-3-* models for
+    shortened vectors, e.g. 256 or 512 instead of 1536.
+    """
+
+    def __init__(self, embeddings_model_name: str = "text-embedding-3-small", cache: Optional[EmbeddingCache] = None,
+                 dimensions: Optional[int] = None):
         load_dotenv()
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.async_client = AsyncOpenAI()
-        self.client = OpenAI()
 
         if self.openai_api_key is None:
             raise ValueError(
                 "OPENAI_API_KEY environment variable is not set. Please set it to your OpenAI API key."
             )
         openai.api_key = self.openai_api_key
+        # Pooled clients shared with every other model using the same key
+        self.client = get_client(self.openai_api_key)
+        self._async_client = None
         self.embeddings_model_name = embeddings_model_name
+        self.cache = cache if cache is not None else get_default_cache()
+
+        if dimensions is None and os.getenv("EMBEDDING_DIMENSIONS"):
+            dimensions = int(os.getenv("EMBEDDING_DIMENSIONS"))
+        self.dimensions = dimensions
+        # Shortened vectors are cached apart from full-size ones of the same model
+        self._cache_model = f"{embeddings_model_name}@{dimensions}" if dimensions else embeddings_model_name
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Shared async client for the running event loop"""
+        return self._async_client or get_async_client(self.openai_api_key)
+
+    @async_client.setter
+    def async_client(self, client: AsyncOpenAI) -> None:
+        self._async_client = client
+
+    @property
+    def dimension(self) -> int:
+        """Length of the vectors this model returns"""
+        return self.dimensions or MODEL_DIMENSIONS.get(self.embeddings_model_name, DEFAULT_DIMENSION)
+
+    def _request_args(self, texts: List[str]) -> dict:
+        args = {"input": texts, "model": self.embeddings_model_name}
+        if self.dimensions:
+            args["dimensions"] = self.dimensions
+        return args
+
+    def _cached(self, list_of_text: List[str]):
+        """Split a request into cached vectors and the texts still to embed"""
+        if self.cache is None:
+            return [None] * len(list_of_text), list(range(len(list_of_text)))
+        cached = self.cache.get_many(self._cache_model, list_of_text)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        return cached, missing
+
+    def _fill(self, list_of_text: List[str], cached, missing, fresh) -> List[List[float]]:
+        """Merge freshly fetched vectors into the cached ones and store them"""
+        for i, vector in zip(missing, fresh):
+            cached[i] = vector
+        if self.cache is not None and missing:
+            self.cache.put_many(
+                self._cache_model, [list_of_text[i] for i in missing], fresh
+            )
+        return cached
 
     async def async_get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            cached, missing = self._cached(list_of_text)
+        else:
+            # The SQLite tier blocks, so cache reads and writes run off the event loop
+            cached, missing = await asyncio.to_thread(self._cached, list_of_text)
+        if not missing:
+            return cached
+
         embedding_response = await self.async_client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
+            **self._request_args([list_of_text[i] for i in missing])
         )
+        fresh = [embeddings.embedding for embeddings in embedding_response.data]
 
-        return [embeddings.embedding for embeddings in embedding_response.data]
+        if self.cache is None:
+            return self._fill(list_of_text, cached, missing, fresh)
+        return await asyncio.to_thread(self._fill, list_of_text, cached, missing, fresh)
 
     async def async_get_embedding(self, text: str) -> List[float]:
-        embedding = await self.async_client.embeddings.create(
-            input=text, model=self.embeddings_model_name
-        )
-
-        return embedding.data[0].embedding
+        return (await self.async_get_embeddings([text]))[0]
 
     def get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
-        embedding_response = self.client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
-        )
+        cached, missing = self._cached(list_of_text)
+        fresh = []
+        if missing:
+            embedding_response = self.client.embeddings.create(
+                **self._request_args([list_of_text[i] for i in missing])
+            )
+            fresh = [embeddings.embedding for embeddings in embedding_response.data]
 
-        return [embeddings.embedding for embeddings in embedding_response.data]
+        return self._fill(list_of_text, cached, missing, fresh)
 
     def get_embedding(self, text: str) -> List[float]:
-        embedding = self.client.embeddings.create(
-            input=text, model=self.embeddings_model_name
-        )
-
-        return embedding.data[0].embedding
+        return self.get_embeddings([text])[0]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Default location of the on-disk cache tier (EMBEDDING_CACHE_PATH overrides it); the temp
+# dir is writable even on read-only deploys
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "embedding_cache.sqlite")
+DEFAULT_MEMORY_SIZE = 10000
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """Content hash of the normalized text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model name, normalized text hash).
+
+    Lookups go to an in-memory LRU first and then to a SQLite table holding the
+    vectors as raw float32 blobs. Disk hits are promoted into the LRU. If the
+    SQLite file cannot be opened the cache runs memory-only. The LRU and the
+    SQLite connection have separate locks, so memory hits never wait on a disk
+    commit from another thread.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, max_memory_items: int = DEFAULT_MEMORY_SIZE):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._conn = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "model TEXT NOT NULL, "
+                    "hash TEXT NOT NULL, "
+                    "vector BLOB NOT NULL, "
+                    "PRIMARY KEY (model, hash))"
+                )
+                self._conn.commit()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Could not open embedding cache at {path} ({e}); caching in memory only")
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = None
+
+    def _remember(self, key, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return the cached vector for each text, or None where there is no entry"""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        in_memory = set()
+
+        with self._lock:
+            missing = list(dict.fromkeys(
+                h for h in hashes if (model, h) not in self._memory
+            ))
+            for h in hashes:
+                key = (model, h)
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[h] = self._memory[key]
+                    in_memory.add(h)
+
+        if missing and self._conn is not None:
+            rows = []
+            with self._disk_lock:
+                # Query the disk tier in slices to stay under SQLite's parameter limit
+                for i in range(0, len(missing), 500):
+                    batch = missing[i:i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows.extend(self._conn.execute(
+                        f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                        [model, *batch],
+                    ).fetchall())
+            with self._lock:
+                for h, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[h] = vector
+                    self._remember((model, h), vector)
+
+        with self._lock:
+            results = []
+            for h in hashes:
+                vector = found.get(h)
+                if vector is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    if h in in_memory:
+                        self.memory_hits += 1
+                    else:
+                        self.disk_hits += 1
+                    results.append(vector.tolist())
+            return results
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store freshly computed vectors in both tiers"""
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                h = text_hash(text)
+                array = np.asarray(vector, dtype=np.float32)
+                self._remember((model, h), array)
+                rows.append((model, h, array.tobytes()))
+
+        if rows and self._conn is not None:
+            with self._disk_lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)", rows
+                )
+                self._conn.commit()
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for monitoring"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
@@ -0,0 +1,38 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional, fall back to a character estimate
+    tiktoken = None
+
+# Rough characters-per-token ratio for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str = "text-embedding-3-small") -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate from length"""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str = "text-embedding-3-small") -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
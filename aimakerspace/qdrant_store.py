@@ -1,17 +1,93 @@
 import numpy as np
 from typing import List, Dict, Any, Optional, Union
+import asyncio
+import functools
+import hashlib
 import uuid
 import os
-from qdrant_client import QdrantClient
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.models import Distance, VectorParams
 from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.openai_utils.batching import EmbeddingBatcher
+from aimakerspace.document_catalog import DocumentCatalog, CATALOG_SUFFIX, VERSION_POINT_ID
+
+# Maximum number of points sent in a single upsert request
+UPSERT_BATCH_SIZE = 256
+
+# Payload field holding the id of the PDF a chunk belongs to
+FILE_ID_FIELD = "metadata.file_id"
+
+# Vector quantization modes (QDRANT_QUANTIZATION): int8 scalar or product quantization
+QUANTIZATION_MODES = ("int8", "pq")
+# Quantized candidates fetched per requested result before rescoring with float vectors
+QUANTIZATION_OVERSAMPLING = 2.0
+
+# Threads running the async methods' calls in local mode; calls are serialized anyway
+LOCAL_ASYNC_WORKERS = 1
+
+
+def legacy_file_id(filename: str):
+    """Derive (file_id, display filename) for points stored without an explicit file_id
+
+    Older uploads encoded the id as a "<file_id>_<name>" prefix of the source
+    filename; anything else falls back to a short hash of the filename.
+    """
+    if '_' in filename:
+        potential_id, display_filename = filename.split('_', 1)
+        # Only use as file_id if it looks like a UUID or is alphanumeric
+        if ('-' in potential_id and len(potential_id) > 8) or potential_id.isalnum():
+            return potential_id, display_filename
+    return hashlib.md5(filename.encode()).hexdigest()[:8], filename
+
+
+def file_id_filter(file_id: str) -> models.Filter:
+    """Filter matching every chunk of one PDF"""
+    return models.Filter(
+        must=[models.FieldCondition(key=FILE_ID_FIELD, match=models.MatchValue(value=file_id))]
+    )
+
+
+class SerializedClient:
+    """Proxy running every method of a QdrantClient under one process-wide lock
+
+    Local (path=...) mode is not thread-safe: concurrent upserts from the
+    ingestion workers, or a search overlapping an upsert, corrupt its
+    in-memory collection until the process restarts. Every caller (the
+    store, the catalog, the BM25 rebuild, the async executor) goes through
+    this proxy, so local calls run one at a time.
+    """
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
 
 class QdrantVectorStore:
     # Class-level shared client to ensure all instances use the same client
     _shared_client = None
+    # Async client for Qdrant Cloud; local storage cannot be opened twice, so its async calls
+    # run on a single thread through the same locked client as the sync methods
+    _shared_async_client = None
+    _executor = None
+    # Collections whose payload index and legacy migration were already handled
+    _prepared_collections = set()
     
-    def __init__(self, collection_name: str = "documents", embedding_model: EmbeddingModel = None):
+    def __init__(self, collection_name: str = "documents", embedding_model: EmbeddingModel = None,
+                 quantization: Optional[str] = None):
         # Initialize or use the shared Qdrant client
         if QdrantVectorStore._shared_client is None:
             # Check for Qdrant Cloud configuration in environment variables
@@ -25,23 +101,44 @@ class QdrantVectorStore:
                     url=qdrant_url,
                     api_key=qdrant_api_key,
                 )
+                QdrantVectorStore._shared_async_client = AsyncQdrantClient(
+                    url=qdrant_url,
+                    api_key=qdrant_api_key,
+                )
             else:
                 # Fall back to local storage
                 print("Using local Qdrant storage")
                 qdrant_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'qdrant_data')
                 os.makedirs(qdrant_path, exist_ok=True)
-                QdrantVectorStore._shared_client = QdrantClient(path=qdrant_path)
+                QdrantVectorStore._shared_client = SerializedClient(QdrantClient(path=qdrant_path))
         
         self.client = QdrantVectorStore._shared_client
         self.collection_name = collection_name
         self.embedding_model = embedding_model or EmbeddingModel()
-        self.embedding_size = 1536  # Default for OpenAI embeddings
+        self.batcher = EmbeddingBatcher(self.embedding_model)
+        self.embedding_size = self.embedding_model.dimension
+        
+        # Optional quantized vectors kept in RAM, with the float originals on disk
+        self.quantization = quantization or os.environ.get("QDRANT_QUANTIZATION") or None
+        if self.quantization is not None and self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"quantization must be one of {QUANTIZATION_MODES}, got '{self.quantization}'")
         
         # Create collection if it doesn't exist
         self._create_collection_if_not_exists()
+        
+        # One record per PDF, kept next to the chunk collection
+        self.catalog = DocumentCatalog(self.client, collection_name + CATALOG_SUFFIX)
+        
+        # Index file_id, backfill it for legacy points and seed the catalog (once per process)
+        if self.collection_name not in QdrantVectorStore._prepared_collections:
+            self._ensure_file_id_index()
+            self.migrate_legacy_file_ids()
+            if self.catalog.count() == 0 and self.client.count(self.collection_name, exact=False).count > 0:
+                self.rebuild_catalog()
+            QdrantVectorStore._prepared_collections.add(self.collection_name)
     
     def _create_collection_if_not_exists(self):
-        """Create the collection if it doesn't exist"""
+        """Create the collection if it doesn't exist, otherwise check its vector size"""
         collections = self.client.get_collections().collections
         collection_names = [collection.name for collection in collections]
         
@@ -50,16 +147,133 @@ class QdrantVectorStore:
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=self.embedding_size,
-                    distance=Distance.COSINE
+                    distance=Distance.COSINE,
+                    on_disk=self.quantization is not None
+                ),
+                quantization_config=self._quantization_config()
+            )
+            return
+        
+        config = self.client.get_collection(self.collection_name).config
+        existing_size = config.params.vectors.size
+        if existing_size != self.embedding_size:
+            raise ValueError(
+                f"Collection '{self.collection_name}' stores {existing_size}-dim vectors but the "
+                f"embedding model returns {self.embedding_size}-dim vectors; use another collection "
+                f"or set EMBEDDING_DIMENSIONS={existing_size}"
+            )
+        
+        if self.quantization is not None:
+            # Enable quantization on a collection created without it
+            if config.quantization_config is None:
+                print(f"Enabling {self.quantization} quantization on '{self.collection_name}'")
+                self.client.update_collection(
+                    collection_name=self.collection_name,
+                    quantization_config=self._quantization_config()
+                )
+    
+    def _quantization_config(self):
+        """Qdrant quantization config for the configured mode, or None"""
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        if self.quantization == "pq":
+            return models.ProductQuantization(
+                product=models.ProductQuantizationConfig(
+                    compression=models.CompressionRatio.X16,
+                    always_ram=True
                 )
             )
+        return None
     
-    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[str]:
-        """Add texts to the vector store"""
-        # Generate embeddings for texts
-        embeddings = self.embedding_model.get_embeddings(texts)
+    def _search_params(self) -> Optional[models.SearchParams]:
+        """Search quantized vectors, then rescore the oversampled candidates with float vectors"""
+        if self.quantization is None:
+            return None
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                rescore=True,
+                oversampling=QUANTIZATION_OVERSAMPLING
+            )
+        )
+    
+    async def _acall(self, method: str, **kwargs):
+        """Run a Qdrant client method without blocking the event loop
         
-        # Create points with embeddings and payload
+        Uses the async client when connected to a server, otherwise runs the
+        synchronous call on a single-thread executor (local mode, where the
+        client lock serializes it with the sync callers too).
+        """
+        if QdrantVectorStore._shared_async_client is not None:
+            return await getattr(QdrantVectorStore._shared_async_client, method)(**kwargs)
+        if QdrantVectorStore._executor is None:
+            QdrantVectorStore._executor = ThreadPoolExecutor(max_workers=LOCAL_ASYNC_WORKERS, thread_name_prefix="qdrant")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            QdrantVectorStore._executor, functools.partial(getattr(self.client, method), **kwargs)
+        )
+    
+    def _ensure_file_id_index(self):
+        """Create a keyword payload index on metadata.file_id if it is missing"""
+        payload_schema = self.client.get_collection(self.collection_name).payload_schema or {}
+        if FILE_ID_FIELD not in payload_schema:
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=FILE_ID_FIELD,
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
+    
+    def migrate_legacy_file_ids(self) -> int:
+        """Backfill metadata.file_id on points that only encode it in their filename"""
+        legacy_filter = models.Filter(
+            must=[models.IsEmptyCondition(is_empty=models.PayloadField(key=FILE_ID_FIELD))]
+        )
+        migrated = 0
+        offset = None
+        
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=legacy_filter,
+                limit=256,
+                with_payload=True,
+                with_vectors=False,
+                offset=offset
+            )
+            
+            operations = []
+            for point in points:
+                metadata = dict((point.payload or {}).get("metadata") or {})
+                filename = metadata.get("source", point.payload.get("source")) if point.payload else None
+                if not filename:
+                    continue
+                metadata["file_id"], _ = legacy_file_id(filename)
+                operations.append(models.SetPayloadOperation(
+                    set_payload=models.SetPayload(payload={"metadata": metadata}, points=[point.id])
+                ))
+            
+            if operations:
+                self.client.batch_update_points(
+                    collection_name=self.collection_name,
+                    update_operations=operations
+                )
+                migrated += len(operations)
+            
+            if offset is None:
+                break
+        
+        if migrated:
+            print(f"Backfilled file_id on {migrated} legacy points in {self.collection_name}")
+        return migrated
+    
+    def _build_points(self, texts: List[str], embeddings: List[List[float]],
+                      metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Create Qdrant points (and their ids) from texts, embeddings and metadata"""
         points = []
         ids = []
         
@@ -87,57 +301,85 @@ class QdrantVectorStore:
             )
             points.append(point)
         
-        # Insert points into collection
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points
-        )
+        return points, ids
+    
+    def _upsert_points(self, points: List[models.PointStruct]) -> None:
+        """Insert points into the collection in bounded batches"""
+        for i in range(0, len(points), UPSERT_BATCH_SIZE):
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=points[i:i + UPSERT_BATCH_SIZE]
+            )
+    
+    def add_embedded_texts(self, texts: List[str], embeddings: List[List[float]],
+                           metadatas: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """Add texts whose embeddings were already computed"""
+        points, ids = self._build_points(texts, embeddings, metadatas)
+        self._upsert_points(points)
         
         return ids
     
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """Add texts to the vector store"""
+        # Generate embeddings in token-bounded batches
+        embeddings = self.batcher.embed(texts)
+        
+        return self.add_embedded_texts(texts, embeddings, metadatas)
+    
     async def aadd_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Add texts to the vector store asynchronously"""
-        # Generate embeddings for texts asynchronously
-        embeddings = await asyncio.gather(*[self._agenerate_embedding(text) for text in texts])
-        
-        # Create points with embeddings and payload
-        points = []
-        ids = []
+        # Generate embeddings in token-bounded batches with bounded concurrency
+        embeddings = await self.batcher.aembed(texts)
         
-        for i, (text, embedding) in enumerate(zip(texts, embeddings)):
-            # Generate a unique ID
-            point_id = str(uuid.uuid4())
-            ids.append(point_id)
-            
-            # Create payload with text
-            payload = {"text": text}
-            
-            # Add metadata if provided
-            if metadatas and i < len(metadatas):
-                # Store metadata in a dedicated field
-                payload["metadata"] = metadatas[i]
-                # Also copy source to the top level for compatibility
-                if "source" in metadatas[i]:
-                    payload["source"] = metadatas[i]["source"]
-            
-            # Create point
-            point = models.PointStruct(
-                id=point_id,
-                vector=embedding,
-                payload=payload
+        points, ids = self._build_points(texts, embeddings, metadatas)
+        for i in range(0, len(points), UPSERT_BATCH_SIZE):
+            await self._acall(
+                "upsert",
+                collection_name=self.collection_name,
+                points=points[i:i + UPSERT_BATCH_SIZE]
             )
-            points.append(point)
-        
-        # Insert points into collection
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points
-        )
         
         return ids
     
     def get_all_pdf_metadata(self) -> List[Dict[str, Any]]:
-        """Retrieve metadata for all PDFs stored in the vector database"""
+        """Retrieve metadata for all PDFs from the document catalog"""
+        try:
+            return self.catalog.list()
+        except Exception as e:
+            print(f"Error retrieving PDF metadata: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+    
+    def get_pdf_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve the catalog record of a single PDF"""
+        return self.catalog.get(file_id)
+    
+    async def acorpus_version(self) -> str:
+        """The catalog's corpus version, fetched without blocking the event loop"""
+        points = await self._acall(
+            "retrieve",
+            collection_name=self.catalog.collection_name,
+            ids=[VERSION_POINT_ID],
+            with_payload=True
+        )
+        return DocumentCatalog.version_from(points)
+    
+    def rebuild_catalog(self) -> int:
+        """Repair command: rebuild the document catalog from a full scan of the chunks"""
+        documents = self.scan_pdf_metadata()
+        self.catalog.clear()
+        for document in documents:
+            self.catalog.upsert(
+                document["file_id"],
+                document["filename"],
+                num_chunks=document["num_chunks"]
+            )
+        print(f"Rebuilt catalog for {self.collection_name} with {len(documents)} documents")
+        return len(documents)
+    
+    def scan_pdf_metadata(self) -> List[Dict[str, Any]]:
+        """Derive per-PDF metadata by scrolling every point (O(chunks), used to rebuild the catalog)"""
         try:
             # Get all points with scroll API
             pdf_files = {}
@@ -169,31 +411,12 @@ class QdrantVectorStore:
                         if "source" in metadata:
                             filename = metadata["source"]
                             
-                            # First, check if file_id is explicitly stored in metadata
+                            # Prefer the explicit file_id, fall back to the legacy filename encoding
+                            legacy_id, display_filename = legacy_file_id(filename)
                             file_id = metadata.get("file_id", None)
-                            
-                            # If no explicit file_id, try to extract it from the filename
-                            if not file_id and '_' in filename:
-                                # Check if the first part looks like a UUID
-                                parts = filename.split('_', 1)
-                                if len(parts) == 2:
-                                    potential_id = parts[0]
-                                    # Only use as file_id if it looks like a UUID or is alphanumeric
-                                    if ('-' in potential_id and len(potential_id) > 8) or potential_id.isalnum():
-                                        file_id = potential_id
-                                        # Use the part after the first underscore as the display filename
-                                        display_filename = parts[1]
-                                    else:
-                                        display_filename = filename
-                                else:
-                                    display_filename = filename
-                            else:
+                            if file_id and file_id != legacy_id:
                                 display_filename = filename
-                            
-                            # If we still don't have a file_id, generate one from the filename
-                            if not file_id:
-                                import hashlib
-                                file_id = hashlib.md5(filename.encode()).hexdigest()[:8]
+                            file_id = file_id or legacy_id
                             
                             # Store PDF metadata
                             if file_id not in pdf_files:
@@ -236,21 +459,12 @@ class QdrantVectorStore:
         search_result = self.client.search(
             collection_name=self.collection_name,
             query_vector=query_embedding,
-            limit=k
+            limit=k,
+            search_params=self._search_params()
         )
         print(f"Search returned {len(search_result)} results")
         
-        # Format results
-        results = []
-        for scored_point in search_result:
-            item = {
-                "text": scored_point.payload.get("text", ""),
-                "source": scored_point.payload.get("source", "Unknown"),
-                "score": scored_point.score,
-            }
-            results.append(item)
-        
-        return results
+        return self._format_results(search_result)
     
     async def _agenerate_embedding(self, text: str) -> List[float]:
         """Generate embedding asynchronously"""
@@ -260,19 +474,62 @@ class QdrantVectorStore:
         """Search for documents similar to query asynchronously"""
         # Generate embedding for query
         embedding = await self._agenerate_embedding(query)
-        
-        # Search in the collection
-        search_result = self.client.search(
+        return await self.asimilarity_search_by_vector(embedding, k)
+    
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 5,
+                                           with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """Search with an already computed query embedding, optionally returning stored vectors"""
+        search_result = await self._acall(
+            "search",
             collection_name=self.collection_name,
             query_vector=embedding,
-            limit=k
+            limit=k,
+            with_vectors=with_vectors,
+            search_params=self._search_params()
         )
         
         print(f"Async search returned {len(search_result)} results")
         if search_result:
             print(f"First result payload: {search_result[0].payload}")
         
-        # Convert to expected format with proper metadata handling
+        return self._format_results(search_result)
+    
+    def _build_search_requests(self, embeddings: List[List[float]], k: int) -> List[models.SearchRequest]:
+        return [
+            models.SearchRequest(vector=embedding, limit=k, with_payload=True,
+                                 params=self._search_params())
+            for embedding in embeddings
+        ]
+    
+    def _search_requests(self, embeddings: List[List[float]], k: int) -> List[List[Dict[str, Any]]]:
+        """Run one Qdrant batch search request for several query vectors"""
+        batch_result = self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=self._build_search_requests(embeddings, k)
+        )
+        return [self._format_results(search_result) for search_result in batch_result]
+    
+    def similarity_search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search for several queries with one embedding request and one batch search"""
+        if not queries:
+            return []
+        embeddings = self.embedding_model.get_embeddings(queries)
+        return self._search_requests(embeddings, k)
+    
+    async def asimilarity_search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search for several queries asynchronously, returning per-query top-k results"""
+        if not queries:
+            return []
+        embeddings = await self.embedding_model.async_get_embeddings(queries)
+        batch_result = await self._acall(
+            "search_batch",
+            collection_name=self.collection_name,
+            requests=self._build_search_requests(embeddings, k)
+        )
+        return [self._format_results(search_result) for search_result in batch_result]
+    
+    def _format_results(self, search_result: List[Union[models.ScoredPoint, models.Record]]) -> List[Dict[str, Any]]:
+        """Convert scored points to result dicts with proper metadata handling"""
         results = []
         for scored_point in search_result:
             payload = scored_point.payload
@@ -296,118 +553,145 @@ class QdrantVectorStore:
             else:
                 source_display = source
             
-            print(f"Found source: {source_display} with score {scored_point.score:.2f}")
+            score = getattr(scored_point, "score", None)
+            if score is not None:
+                print(f"Found source: {source_display} with score {score:.2f}")
                 
-            results.append({
+            result = {
+                "id": scored_point.id,
                 "text": text,
                 "metadata": metadata,
                 "source": source_display,
-                "score": scored_point.score
-            })
+                "score": score
+            }
+            if scored_point.vector is not None:
+                result["vector"] = scored_point.vector
+            results.append(result)
         
         return results
         
+    def get_points_by_file_id(self, file_id: str, with_vectors: bool = False) -> List[models.Record]:
+        """Return every point belonging to a PDF using the file_id payload index"""
+        records = []
+        offset = None
+        
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=file_id_filter(file_id),
+                limit=256,
+                with_payload=True,
+                with_vectors=with_vectors,
+                offset=offset
+            )
+            records.extend(points)
+            if offset is None:
+                break
+        
+        return records
+    
+    def iter_chunks(self, batch_size: int = 256):
+        """Yield (ids, texts, file_ids) for every stored chunk, one scroll page at a time"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=batch_size,
+                with_payload=True,
+                with_vectors=False,
+                offset=offset
+            )
+            payloads = [point.payload or {} for point in points]
+            yield (
+                [point.id for point in points],
+                [payload.get("text", "") for payload in payloads],
+                [(payload.get("metadata") or {}).get("file_id") for payload in payloads]
+            )
+            if offset is None:
+                break
+    
+    async def aget_points(self, point_ids: List[Union[str, int]], with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """Fetch points by id as result dicts (score is None, they were not searched)"""
+        if not point_ids:
+            return []
+        records = await self._acall(
+            "retrieve",
+            collection_name=self.collection_name,
+            ids=point_ids,
+            with_payload=True,
+            with_vectors=with_vectors
+        )
+        return self._format_results(records)
+    
+    def update_metadata(self, metadatas: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the metadata of existing points (keyed by point id), keeping their vectors"""
+        operations = [
+            models.SetPayloadOperation(set_payload=models.SetPayload(
+                payload={"metadata": metadata, "source": metadata.get("source")},
+                points=[point_id]
+            ))
+            for point_id, metadata in metadatas.items()
+        ]
+        for i in range(0, len(operations), UPSERT_BATCH_SIZE):
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=operations[i:i + UPSERT_BATCH_SIZE]
+            )
+    
+    def delete_points(self, point_ids: List[Union[str, int]]) -> None:
+        """Delete points by id in bounded batches"""
+        for i in range(0, len(point_ids), UPSERT_BATCH_SIZE):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.PointIdsList(points=point_ids[i:i + UPSERT_BATCH_SIZE])
+            )
+    
+    def count_by_file_id(self, file_id: str) -> int:
+        """Number of chunks stored for a PDF"""
+        return self.client.count(
+            collection_name=self.collection_name,
+            count_filter=file_id_filter(file_id),
+            exact=True
+        ).count
+    
     def delete_pdf_by_file_id(self, file_id: str) -> bool:
         """Delete all vector points associated with a specific PDF file_id"""
         try:
             print(f"Attempting to delete PDF with file_id: {file_id}")
-            point_ids_to_delete = []
-            offset = None
-            total_points_checked = 0
+            num_points = self.count_by_file_id(file_id)
             
-            # We need to scroll through all points in batches
-            while True:
-                # Get points with scroll API
-                scroll_result = self.client.scroll(
-                    collection_name=self.collection_name,
-                    limit=100,  # Fetch in batches
-                    with_payload=True,
-                    with_vectors=False,  # We don't need the vectors
-                    offset=offset  # Continue from last batch
-                )
-                
-                # Process results
-                points = scroll_result[0]
-                total_points_checked += len(points)
-                print(f"Checking batch of {len(points)} points, total checked: {total_points_checked}")
-                
-                # If no more points, break the loop
-                if not points:
-                    break
-                
-                # Get the offset for the next batch
-                offset = scroll_result[1]
-                
-                # Find points that belong to this PDF
-                for point in points:
-                    if point.payload and "metadata" in point.payload:
-                        metadata = point.payload["metadata"]
-                        
-                        # Method 0: Check if file_id is directly stored in metadata
-                        if "file_id" in metadata and metadata["file_id"] == file_id:
-                            point_ids_to_delete.append(point.id)
-                            print(f"Found match by direct metadata file_id: {metadata.get('source', 'unknown')}")
-                            continue
-                            
-                        if "source" in metadata:
-                            filename = metadata["source"]
-                            print(f"Checking source: {filename}")
-                            
-                            # Method 1: Direct file_id match at start of filename
-                            if '_' in filename and filename.startswith(f"{file_id}_"):
-                                point_ids_to_delete.append(point.id)
-                                print(f"Found match by prefix: {filename}")
-                                continue
-                            
-                            # Method 2: Check if the first part looks like a UUID or matches our file_id
-                            extracted_file_id = None
-                            if '_' in filename:
-                                parts = filename.split('_', 1)
-                                if len(parts) == 2:
-                                    potential_id = parts[0]
-                                    # Only use as file_id if it looks like a UUID or is alphanumeric
-                                    if ('-' in potential_id and len(potential_id) > 8) or potential_id.isalnum():
-                                        extracted_file_id = potential_id
-                            
-                            # If we couldn't extract a file_id, generate one from the filename
-                            if not extracted_file_id:
-                                import hashlib
-                                extracted_file_id = hashlib.md5(filename.encode()).hexdigest()[:8]
-                                print(f"Generated hash ID for {filename}: {extracted_file_id}")
-                                
-                            if extracted_file_id == file_id:
-                                point_ids_to_delete.append(point.id)
-                                print(f"Found match by extracted ID: {filename} -> {extracted_file_id}")
-                
-                # If we've processed all points (no more offset), break the loop
-                if offset is None:
-                    break
-            
-            # Delete the points if any were found
-            if point_ids_to_delete:
-                from qdrant_client import models
-                print(f"Deleting {len(point_ids_to_delete)} points for file_id: {file_id}")
-                
-                # Delete in batches of 100 to avoid hitting limits
-                batch_size = 100
-                for i in range(0, len(point_ids_to_delete), batch_size):
-                    batch = point_ids_to_delete[i:i+batch_size]
-                    self.client.delete(
-                        collection_name=self.collection_name,
-                        points_selector=models.PointIdsList(
-                            points=batch
-                        )
-                    )
-                    print(f"Deleted batch {i//batch_size + 1} of {(len(point_ids_to_delete) + batch_size - 1) // batch_size}")
-                
-                print(f"Successfully deleted all {len(point_ids_to_delete)} points for file_id: {file_id}")
-                return True
-            else:
-                print(f"No points found for file_id: {file_id} after checking {total_points_checked} points")
+            if num_points == 0:
+                # A catalog record without chunks is left over from a failed ingestion
+                if self.catalog.get(file_id) is not None:
+                    self.catalog.delete(file_id)
+                    print(f"Removed catalog record without points for file_id: {file_id}")
+                    return True
+                print(f"No points found for file_id: {file_id}")
                 return False
+            
+            # Delete by filter so the cost is proportional to this PDF's chunks
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.FilterSelector(filter=file_id_filter(file_id))
+            )
+            self.catalog.delete(file_id)
+            
+            print(f"Successfully deleted all {num_points} points for file_id: {file_id}")
+            return True
                 
         except Exception as e:
             print(f"Error deleting PDF: {e}")
             import traceback
             traceback.print_exc()
             return False
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Repair command: python -m aimakerspace.qdrant_store rebuild-catalog [collection_name]
+    if len(sys.argv) >= 2 and sys.argv[1] == "rebuild-catalog":
+        store = QdrantVectorStore(collection_name=sys.argv[2] if len(sys.argv) > 2 else "documents")
+        store.rebuild_catalog()
+    else:
+        print("Usage: python -m aimakerspace.qdrant_store rebuild-catalog [collection_name]")
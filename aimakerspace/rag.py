@@ -1,7 +1,12 @@
 from typing import List, Dict, Any, Optional
+import numpy as np
 from aimakerspace.qdrant_store import QdrantVectorStore
 from aimakerspace.openai_utils.chatmodel import ChatOpenAI
 from aimakerspace.openai_utils.prompts import SystemRolePrompt, UserRolePrompt
+from aimakerspace.openai_utils.tokens import count_tokens, truncate_to_tokens
+from aimakerspace.retrieval import diversify, reciprocal_rank_fusion, DEFAULT_FETCH_FACTOR, DEFAULT_MMR_LAMBDA
+from aimakerspace.bm25_index import get_bm25_index
+from aimakerspace.answer_cache import SemanticAnswerCache, answer_cache_from_env, prompt_hash
 
 # RAG Engine Constants
 DEFAULT_SYSTEM_PROMPT = "You are a helpful AI assistant that answers questions based on the provided context."
@@ -26,15 +31,113 @@ MIN_RELEVANCE_SCORE = 0.5
 
 # Context Formatting
 CONTEXT_FORMAT = "Document {index} (Source: {source}):\n{text}\n"
+CONTEXT_SEPARATOR = "\n\n"
+# Maximum tokens of retrieved text put into a prompt
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+# A block is only cut to fit the budget if at least this many tokens of it remain
+MIN_TRUNCATED_BLOCK_TOKENS = 50
+# Shorter suffix/prefix matches between consecutive chunks are treated as coincidence
+MIN_OVERLAP_CHARS = 16
+
+
+def merge_overlapping(first: str, second: str) -> str:
+    """Join two consecutive chunks, dropping the overlap the splitter repeated"""
+    for size in range(min(len(first), len(second)), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
 
 class RAGQueryEngine:
     def __init__(self, 
                  collection_name: str = DEFAULT_COLLECTION_NAME, 
                  model_name: str = DEFAULT_MODEL_NAME,
-                 k: int = DEFAULT_K):
+                 k: int = DEFAULT_K,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 fetch_factor: int = DEFAULT_FETCH_FACTOR,
+                 mmr_lambda: Optional[float] = DEFAULT_MMR_LAMBDA,
+                 hybrid: bool = True,
+                 context_token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET):
         self.vector_store = QdrantVectorStore(collection_name=collection_name)
         self.chat_model = ChatOpenAI(model_name=model_name)
         self.k = k
+        # Over-fetch k * fetch_factor candidates, then dedup and diversify down to k (mmr_lambda=None: no MMR)
+        self.fetch_factor = fetch_factor
+        self.mmr_lambda = mmr_lambda
+        # BM25 index fused with dense results so exact terms ("EMOM", movement names) are found
+        self.lexical_index = get_bm25_index(self.vector_store) if hybrid else None
+        self.context_token_budget = context_token_budget
+        # Answers reused for near-identical questions until the documents change
+        self.answer_cache = answer_cache if answer_cache is not None else answer_cache_from_env()
+    
+    async def _acorpus_version(self) -> Optional[str]:
+        # Read from the shared catalog so every instance drops answers when any of them ingests
+        if self.answer_cache is None:
+            return None
+        return await self.vector_store.acorpus_version()
+    
+    def _cache_lookup(self, query_embedding: List[float], system_prompt: str,
+                      version: Optional[str]) -> Optional[Dict[str, Any]]:
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.lookup(
+            query_embedding,
+            prompt_hash(self.chat_model.model_name, system_prompt),
+            version
+        )
+    
+    def _cache_store(self, query_embedding: List[float], system_prompt: str, version: Optional[str],
+                     answer: str, sources: List[Dict[str, Any]]) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.store(
+                query_embedding, prompt_hash(self.chat_model.model_name, system_prompt), version, answer, sources
+            )
+    
+    async def _alexical_results(self, query: str, query_embedding: List[float],
+                                dense_by_id: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """BM25 hits as result dicts in BM25 order, fetching chunks the dense search did not return"""
+        hits = [doc_id for doc_id, _ in self.lexical_index.search(query, self.k * self.fetch_factor)]
+        
+        # Legacy points may have integer ids; the index stores ids as strings
+        missing = [int(doc_id) if doc_id.isdigit() else doc_id for doc_id in hits if doc_id not in dense_by_id]
+        fetched = await self.vector_store.aget_points(missing, with_vectors=True)
+        
+        # Lexical-only chunks get a cosine score so relevance thresholds keep their meaning
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1)
+        for result in fetched:
+            vector = np.asarray(result["vector"], dtype=np.float32)
+            result["score"] = float(vector @ query_vector / (np.linalg.norm(vector) or 1))
+        
+        # Chunks found by both searches use the dense copy
+        by_id = {**{str(result["id"]): result for result in fetched}, **dense_by_id}
+        return [by_id[doc_id] for doc_id in hits if doc_id in by_id]
+    
+    async def _asearch(self, query: str, query_embedding: List[float]) -> List[Dict[str, Any]]:
+        """Over-fetch dense (and BM25) candidates, fuse them, dedup and keep k diverse results"""
+        candidates = await self.vector_store.asimilarity_search_by_vector(
+            query_embedding, k=self.k * self.fetch_factor, with_vectors=self.mmr_lambda is not None
+        )
+        
+        if self.lexical_index is not None and len(self.lexical_index):
+            dense_by_id = {str(result["id"]): result for result in candidates}
+            lexical = await self._alexical_results(query, query_embedding, dense_by_id)
+            candidates = reciprocal_rank_fusion([candidates, lexical])
+        
+        return diversify(candidates, query_embedding, self.k, self.mmr_lambda)
+    
+    async def asearch(self, query: str) -> List[Dict[str, Any]]:
+        """Retrieve k deduplicated, diversified results for a query"""
+        query_embedding = await self.vector_store._agenerate_embedding(query)
+        return await self._asearch(query, query_embedding)
+    
+    @staticmethod
+    def _sources(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Source entries (text, source, score) returned alongside an answer"""
+        return [{
+            "text": result["text"],
+            "source": (result.get("metadata") or {}).get("source", result.get("source", "Unknown")),
+            "score": result["score"]
+        } for result in search_results]
     
     def query(self, query: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
         """Query the RAG system with a question"""
@@ -52,7 +155,7 @@ class RAGQueryEngine:
         
         # Create messages for the chat model
         messages = [
-            SystemRolePrompt(system_prompt or self.DEFAULT_SYSTEM_PROMPT).create_message(),
+            SystemRolePrompt(system_prompt or DEFAULT_SYSTEM_PROMPT).create_message(),
             UserRolePrompt(
                 f"Context:\n{context}\n\nQuestion: {query}\n\nAnswer:"
             ).create_message()
@@ -62,11 +165,7 @@ class RAGQueryEngine:
         response = self.chat_model.run(messages)
         
         # Extract sources
-        sources = [{
-            "text": result["text"],
-            "source": result["metadata"].get("source", "Unknown"),
-            "score": result["score"]
-        } for result in search_results]
+        sources = self._sources(search_results)
         
         return {
             "answer": response,
@@ -75,8 +174,17 @@ class RAGQueryEngine:
     
     async def aquery(self, query: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
         """Query the RAG system with a question asynchronously"""
+        system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
+        
+        # Embed once: the embedding serves both the answer cache and the search
+        query_embedding = await self.vector_store._agenerate_embedding(query)
+        version = await self._acorpus_version()
+        cached = self._cache_lookup(query_embedding, system_prompt, version)
+        if cached is not None:
+            return {"answer": cached["answer"], "sources": cached["sources"]}
+        
         # Search for relevant documents
-        search_results = await self.vector_store.asimilarity_search(query, k=self.k)
+        search_results = await self._asearch(query, query_embedding)
         
         if not search_results:
             return {
@@ -84,92 +192,189 @@ class RAGQueryEngine:
                 "sources": []
             }
         
-        # Format context from search results
-        context = self._format_context(search_results)
+        # Format a token-budgeted context from search results
+        built = self.build_context(search_results)
+        context = built["context"]
         
         # Create messages for the chat model
         messages = [
-            SystemRolePrompt(system_prompt or self.DEFAULT_SYSTEM_PROMPT).create_message(),
+            SystemRolePrompt(system_prompt).create_message(),
             UserRolePrompt(
                 f"Context:\n{context}\n\nQuestion: {query}\n\nAnswer:"
             ).create_message()
         ]
         
-        # Get response from chat model
-        response = self.chat_model.run(messages)
+        # Await the response without blocking the event loop
+        response = await self.chat_model.arun(messages)
         
         # Extract sources
-        sources = [{
-            "text": result["text"],
-            "source": result["metadata"].get("source", "Unknown"),
-            "score": result["score"]
-        } for result in search_results]
+        sources = self._sources(search_results)
+        self._cache_store(query_embedding, system_prompt, version, response, sources)
         
         return {
             "answer": response,
-            "sources": sources
+            "sources": sources,
+            "context_tokens": built["tokens"]
         }
     
-    async def astream_query(self, query: str, system_prompt: Optional[str] = None):
-        """Stream the RAG response asynchronously"""
-        try:
-            # Search for relevant documents
-            search_results = await self.vector_store.asimilarity_search(query, k=self.k)
-            
-            # If no relevant PDF content is found, return a clear message and stop
-            if not search_results or len(search_results) == 0:
-                yield NO_PDF_CONTENT_RESPONSE
-                return
-                
-            # Check if ALL relevance scores are too low
-            max_score = max(result.get('score', 0) for result in search_results)
-            avg_score = sum(result.get('score', 0) for result in search_results) / len(search_results)
-            
-            # Only show the not relevant message if ALL scores are below threshold
-            if max_score < MIN_RELEVANCE_SCORE:
-                relevance_percentage = int(avg_score * 100)
-                yield LOW_RELEVANCE_RESPONSE.format(relevance_percentage=relevance_percentage)
-                return
-            
-            # Format context from search results
-            context = self._format_context(search_results)
-            
-        except Exception as e:
-            yield ERROR_RESPONSE
+    async def aretrieve(self, query: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Embed the query once and fetch what answering it needs
+        
+        Returns the query embedding, the search results (skipped on an answer
+        cache hit), the sources to show and the cached answer if any. Pass the
+        result to astream_retrieved to stream the answer without searching again.
+        """
+        # Add the persona reminder to the system prompt from the frontend or default
+        enhanced_system_prompt = (system_prompt or DEFAULT_SYSTEM_PROMPT) + PERSONA_REMINDER
+        
+        query_embedding = await self.vector_store._agenerate_embedding(query)
+        retrieval = {
+            "query": query,
+            "system_prompt": enhanced_system_prompt,
+            "query_embedding": query_embedding,
+            "version": await self._acorpus_version(),
+            "results": [],
+            "sources": [],
+            "cached_answer": None,
+        }
+        
+        # A near-identical question was already answered against the same documents
+        cached = self._cache_lookup(query_embedding, enhanced_system_prompt, retrieval["version"])
+        if cached is not None:
+            retrieval["cached_answer"] = cached["answer"]
+            retrieval["sources"] = cached["sources"]
+            return retrieval
+        
+        # Search for relevant documents
+        retrieval["results"] = await self._asearch(query, query_embedding)
+        retrieval["sources"] = self._sources(retrieval["results"])
+        return retrieval
+    
+    async def astream_retrieved(self, retrieval: Dict[str, Any]):
+        """Stream the answer for a retrieval from aretrieve"""
+        if retrieval["cached_answer"] is not None:
+            yield retrieval["cached_answer"]
+            yield STREAM_COMPLETE_MARKER
             return
         
-        # Use the system prompt from the frontend or default
-        system_prompt = system_prompt or self.DEFAULT_SYSTEM_PROMPT
+        search_results = retrieval["results"]
         
-        # Add the persona reminder to the system prompt
-        enhanced_system_prompt = system_prompt + PERSONA_REMINDER
+        # If no relevant PDF content is found, return a clear message and stop
+        if not search_results:
+            yield NO_PDF_CONTENT_RESPONSE
+            return
+            
+        # Check if ALL relevance scores are too low
+        max_score = max(result.get('score', 0) for result in search_results)
+        avg_score = sum(result.get('score', 0) for result in search_results) / len(search_results)
+        
+        # Only show the not relevant message if ALL scores are below threshold
+        if max_score < MIN_RELEVANCE_SCORE:
+            relevance_percentage = int(avg_score * 100)
+            yield LOW_RELEVANCE_RESPONSE.format(relevance_percentage=relevance_percentage)
+            return
+        
+        # Format a token-budgeted context from search results
+        built = self.build_context(search_results)
+        context = built["context"]
+        retrieval["context_tokens"] = built["tokens"]
+        print(f"Context: {built['num_blocks']} blocks, {built['tokens']} tokens")
         
         # Create messages for the chat model
         messages = [
-            SystemRolePrompt(enhanced_system_prompt).create_message(),
+            SystemRolePrompt(retrieval["system_prompt"]).create_message(),
             UserRolePrompt(
-                f"Context:\n{context}\n\nQuestion: {query}\n\nAnswer:"
+                f"Context:\n{context}\n\nQuestion: {retrieval['query']}\n\nAnswer:"
             ).create_message()
         ]
         
         # Stream response from chat model
+        answer = []
         async for chunk in self.chat_model.astream(messages):
+            answer.append(chunk)
             yield chunk
+        
+        # Only complete answers are cached
+        self._cache_store(retrieval["query_embedding"], retrieval["system_prompt"], retrieval["version"],
+                          "".join(answer), retrieval["sources"])
             
         # Add completion marker to signal the end of the stream
         yield STREAM_COMPLETE_MARKER
     
+    async def astream_query(self, query: str, system_prompt: Optional[str] = None):
+        """Stream the RAG response asynchronously"""
+        try:
+            retrieval = await self.aretrieve(query, system_prompt)
+        except Exception as e:
+            yield ERROR_RESPONSE
+            return
+        
+        async for chunk in self.astream_retrieved(retrieval):
+            yield chunk
+    
+    def _context_blocks(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge runs of consecutive chunks of the same file into blocks, best ranked block first"""
+        groups = {}
+        for rank, result in enumerate(search_results):
+            metadata = result.get("metadata") or {}
+            key = metadata.get("file_id") if metadata.get("chunk_index") is not None else ("result", rank)
+            groups.setdefault(key, []).append((rank, result))
+        
+        blocks = []
+        for members in groups.values():
+            members.sort(key=lambda member: (member[1].get("metadata") or {}).get("chunk_index", 0))
+            block = None
+            for rank, result in members:
+                metadata = result.get("metadata") or {}
+                chunk_index = metadata.get("chunk_index")
+                if block is not None and chunk_index is not None and chunk_index == block["last_index"] + 1:
+                    block["text"] = merge_overlapping(block["text"], result.get("text", ""))
+                    block["rank"] = min(block["rank"], rank)
+                    block["last_index"] = chunk_index
+                    continue
+                block = {
+                    "text": result.get("text", ""),
+                    "source": metadata.get("source", result.get("source", "Unknown")),
+                    "rank": rank,
+                    "last_index": chunk_index if chunk_index is not None else -2,
+                }
+                blocks.append(block)
+        
+        return sorted(blocks, key=lambda block: block["rank"])
+    
+    def build_context(self, search_results: List[Dict[str, Any]], token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """Assemble the prompt context within a token budget
+        
+        Adjacent and overlapping chunks of the same file are merged, blocks are
+        added best ranked first and the last one that fits is truncated.
+        Returns the context, the tokens it uses and how many blocks were kept.
+        """
+        budget = self.context_token_budget if token_budget is None else token_budget
+        model_name = self.chat_model.model_name
+        
+        parts = []
+        used = 0
+        for block in self._context_blocks(search_results):
+            separator_tokens = count_tokens(CONTEXT_SEPARATOR, model_name) if parts else 0
+            header = CONTEXT_FORMAT.format(index=len(parts) + 1, source=block["source"], text="")
+            overhead = separator_tokens + count_tokens(header, model_name)
+            text_tokens = count_tokens(block["text"], model_name)
+            
+            text = block["text"]
+            if used + overhead + text_tokens > budget:
+                remaining = budget - used - overhead
+                if remaining < MIN_TRUNCATED_BLOCK_TOKENS:
+                    break
+                text = truncate_to_tokens(text, remaining, model_name)
+                text_tokens = count_tokens(text, model_name)
+            
+            parts.append(CONTEXT_FORMAT.format(index=len(parts) + 1, source=block["source"], text=text))
+            used += overhead + text_tokens
+        
+        return {"context": CONTEXT_SEPARATOR.join(parts), "tokens": used, "num_blocks": len(parts)}
+    
     def _format_context(self, search_results: List[Dict[str, Any]]) -> str:
-        """Format search results into a context string for prompt"""
-        # Extract text and source from search results
-        formatted_results = []
-        for i, result in enumerate(search_results):
-            try:
-                text = result.get("text", "")
-                source = result.get("metadata", {}).get("source", "Unknown")
-                formatted_results.append(CONTEXT_FORMAT.format(index=i+1, source=source, text=text))
-            except Exception:
-                # Skip this result if there's an error
-                pass
-        
-        return "\n\n".join(formatted_results)
+        """Format search results into a token-budgeted context string for prompt"""
+        built = self.build_context(search_results)
+        print(f"Context: {built['num_blocks']} blocks, {built['tokens']} tokens (budget {self.context_token_budget})")
+        return built["context"]
@@ -0,0 +1,111 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Candidates fetched per final result, so diversification has something to choose from
+DEFAULT_FETCH_FACTOR = 4
+# MMR trade-off between relevance to the query (1.0) and novelty versus picked results (0.0)
+DEFAULT_MMR_LAMBDA = 0.7
+# Reciprocal rank fusion constant: damps the weight of the very first ranks
+RRF_K = 60
+
+
+def result_key(result: Dict[str, Any]):
+    """Identity of the chunk behind a search result
+
+    (file_id, chunk_index) from the metadata; results without it fall back to
+    a hash of their text so repeated legacy chunks still collapse.
+    """
+    metadata = result.get("metadata") or {}
+    if metadata.get("file_id") is not None and metadata.get("chunk_index") is not None:
+        return (metadata["file_id"], metadata["chunk_index"])
+    return ("text", hashlib.sha256(result.get("text", "").encode("utf-8")).hexdigest())
+
+
+def dedup_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop repeated chunks, keeping the first (best ranked) occurrence"""
+    seen = set()
+    unique = []
+    for result in results:
+        key = result_key(result)
+        if key not in seen:
+            seen.add(key)
+            unique.append(result)
+    return unique
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict[str, Any]]], rrf_k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Merge ranked result lists by summing 1 / (rrf_k + rank) per chunk
+
+    Chunks are matched with result_key; the first list's copy of a chunk is
+    kept (pass dense results first so their vectors and scores survive). Each
+    returned result carries its "fused_score", best first.
+    """
+    fused = {}
+    for results in ranked_lists:
+        for rank, result in enumerate(results):
+            key = result_key(result)
+            if key not in fused:
+                fused[key] = dict(result, fused_score=0.0)
+            fused[key]["fused_score"] += 1.0 / (rrf_k + rank + 1)
+    return sorted(fused.values(), key=lambda result: result["fused_score"], reverse=True)
+
+
+def mmr(query_vector, candidate_vectors, k: int, lambda_mult: float = DEFAULT_MMR_LAMBDA,
+        relevance: Optional[np.ndarray] = None) -> List[int]:
+    """Maximal Marginal Relevance: indices of k candidates, relevant but not redundant
+
+    Each step picks argmax(lambda * sim(query, c) - (1 - lambda) * max sim(c, picked)).
+    Similarities are computed once as a matrix; the running max over picked
+    results is updated with one vector operation per step. `relevance`
+    replaces sim(query, c), e.g. with normalized fused scores.
+    """
+    vectors = np.asarray(candidate_vectors, dtype=np.float32)
+    if len(vectors) == 0 or k <= 0:
+        return []
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(np.linalg.norm(query), 1e-12)
+
+    if relevance is None:
+        relevance = vectors @ query
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = vectors @ vectors.T
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+
+    selected = []
+    for _ in range(min(k, len(vectors))):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+def diversify(results: List[Dict[str, Any]], query_vector, k: int,
+              lambda_mult: Optional[float] = DEFAULT_MMR_LAMBDA) -> List[Dict[str, Any]]:
+    """Dedup over-fetched results and pick k of them with MMR
+
+    Results need the "vector" returned by a with_vectors search; without
+    vectors (or with lambda_mult=None) the top k unique results are kept.
+    Fused results are weighted by their fused_score instead of query
+    similarity. The vectors are dropped from the returned results.
+    """
+    unique = dedup_results(results)
+    if lambda_mult is not None and unique and all(result.get("vector") is not None for result in unique):
+        relevance = None
+        if all("fused_score" in result for result in unique):
+            relevance = np.array([result["fused_score"] for result in unique])
+            relevance = relevance / relevance.max()
+        vectors = [result["vector"] for result in unique]
+        picked = [unique[i] for i in mmr(query_vector, vectors, k, lambda_mult, relevance)]
+    else:
+        picked = unique[:k]
+    return [{key: value for key, value in result.items() if key != "vector"} for result in picked]
@@ -1,7 +1,31 @@
+import multiprocessing
 import os
-from typing import List
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 import PyPDF2
 
+from aimakerspace.openai_utils.tokens import CHARS_PER_TOKEN, count_tokens, truncate_to_tokens
+
+# Documents shorter than this are extracted in-process; pool startup would dominate
+PARALLEL_MIN_PAGES = 16
+# Page ranges handed out per worker, so uneven pages still balance across the pool
+RANGES_PER_WORKER = 4
+
+# Extraction pool shared by every PDFLoader, started on first use. Its workers are
+# started with forkserver/spawn: forking a server that runs ingestion threads can
+# deadlock on locks those threads hold
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+# Inside a pool worker: the (path, stat signature, file, reader) of the last PDF opened
+_worker_document = None
+# Boundaries tried by RecursiveTextSplitter, coarsest first: paragraph, line, sentence, word
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", "? ", "! ", " ")
+# Token sizing of recursive chunks (about 1000 characters of English text)
+DEFAULT_CHUNK_TOKENS = 256
+DEFAULT_CHUNK_OVERLAP_TOKENS = 32
+
 
 class TextFileLoader:
     def __init__(self, path: str, encoding: str = "utf-8"):
@@ -62,11 +86,184 @@ class CharacterTextSplitter:
             chunks.extend(self.split(text))
         return chunks
 
+    def split_stream(self, texts: Iterable[str]) -> Iterator[str]:
+        """Split a stream of text pieces (e.g. pages) as if they were one string
+
+        Only about one chunk plus the current piece is held in memory, and the
+        output matches split("".join(texts)).
+        """
+        step = self.chunk_size - self.chunk_overlap
+        buffer = ""
+        for text in texts:
+            buffer += text
+            while len(buffer) >= self.chunk_size:
+                yield buffer[: self.chunk_size]
+                buffer = buffer[step:]
+        for i in range(0, len(buffer), step):
+            yield buffer[i : i + self.chunk_size]
+
+
+def split_keep_separator(text: str, separator: str) -> List[str]:
+    """Split text after each separator, keeping it at the end of its piece"""
+    parts = text.split(separator)
+    pieces = [part + separator for part in parts[:-1]]
+    if parts[-1]:
+        pieces.append(parts[-1])
+    return pieces
+
+
+class RecursiveTextSplitter:
+    """Token-sized chunks cut at the coarsest natural boundary that fits
+
+    Text is split on paragraphs, then oversized pieces on lines, sentences and
+    words (a hard token cut is the last resort). Pieces are packed greedily
+    into chunks of at most chunk_size tokens; the trailing pieces of a chunk,
+    up to chunk_overlap tokens, are repeated at the start of the next one.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_TOKENS,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP_TOKENS,
+        separators: Optional[Sequence[str]] = None,
+        model_name: str = "text-embedding-3-small",
+    ):
+        assert (
+            chunk_size > chunk_overlap
+        ), "Chunk size must be greater than chunk overlap"
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators or DEFAULT_SEPARATORS)
+        self.model_name = model_name
+
+    def _length(self, text: str) -> int:
+        return count_tokens(text, self.model_name)
+
+    def _pieces(self, text: str, separators: Sequence[str]) -> Iterator[Tuple[str, int]]:
+        """(piece, tokens) pairs of at most chunk_size tokens, in text order"""
+        length = self._length(text)
+        if length <= self.chunk_size:
+            if text:
+                yield text, length
+            return
+        for i, separator in enumerate(separators):
+            if separator in text:
+                for part in split_keep_separator(text, separator):
+                    yield from self._pieces(part, separators[i + 1:])
+                return
+        # No boundary left (e.g. a long URL or table row): cut by tokens
+        while text:
+            head = truncate_to_tokens(text, self.chunk_size, self.model_name)
+            if not head or not text.startswith(head):
+                head = text[: self.chunk_size * CHARS_PER_TOKEN]
+            yield head, self._length(head)
+            text = text[len(head):]
+
+    def _merge(self, pieces: Iterable[Tuple[str, int]]) -> Iterator[str]:
+        """Pack pieces into chunks, carrying up to chunk_overlap tokens forward"""
+        window = []
+        total = 0
+        for piece, length in pieces:
+            if window and total + length > self.chunk_size:
+                chunk = "".join(text for text, _ in window).strip()
+                if chunk:
+                    yield chunk
+                while window and (total > self.chunk_overlap or total + length > self.chunk_size):
+                    total -= window.pop(0)[1]
+            window.append((piece, length))
+            total += length
+        chunk = "".join(text for text, _ in window).strip()
+        if chunk:
+            yield chunk
+
+    def split(self, text: str) -> List[str]:
+        return list(self._merge(self._pieces(text, self.separators)))
+
+    def split_texts(self, texts: List[str]) -> List[str]:
+        chunks = []
+        for text in texts:
+            chunks.extend(self.split(text))
+        return chunks
+
+    def split_stream(self, texts: Iterable[str]) -> Iterator[str]:
+        """Split a stream of text pieces (e.g. pages) without joining them
+
+        Text is buffered only up to its last boundary; everything before it is
+        split and packed right away, so chunks still span page breaks. Chunks
+        match split("".join(texts)) except where an oversized paragraph
+        crosses a page break.
+        """
+        return self._merge(self._stream_pieces(texts))
+
+    def _split_on(self, text: str, index: int) -> Iterator[Tuple[str, int]]:
+        """Pieces of text split on separators[index] first, as _pieces does for long text"""
+        for part in split_keep_separator(text, self.separators[index]):
+            yield from self._pieces(part, self.separators[index + 1:])
+
+    def _stream_pieces(self, texts: Iterable[str]) -> Iterator[Tuple[str, int]]:
+        buffer = ""
+        for text in texts:
+            buffer += text
+            for i, separator in enumerate(self.separators):
+                cut = buffer.rfind(separator)
+                if cut > 0:
+                    cut += len(separator)
+                    yield from self._split_on(buffer[:cut], i)
+                    buffer = buffer[cut:]
+                    break
+        for i, separator in enumerate(self.separators):
+            if separator in buffer:
+                yield from self._split_on(buffer, i)
+                return
+        yield from self._pieces(buffer, self.separators)
+
+
+def _worker_reader(path: str) -> PyPDF2.PdfReader:
+    """Reader for path, reused across the ranges of one document a worker is handed
+
+    Only the last document is kept open, so a worker parses each PDF once
+    instead of once per range.
+    """
+    global _worker_document
+    stat = os.stat(path)
+    signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if _worker_document is None or _worker_document[:2] != (path, signature):
+        if _worker_document is not None:
+            _worker_document[2].close()
+        file = open(path, 'rb')
+        _worker_document = (path, signature, file, PyPDF2.PdfReader(file))
+    return _worker_document[3]
+
+
+def extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF (runs inside pool workers)"""
+    pdf_reader = _worker_reader(path)
+    return [pdf_reader.pages[i].extract_text() + "\n" for i in range(start, end)]
+
+
+def get_extract_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide extraction pool, sized by the first caller"""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _extract_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        return _extract_pool
+
+
+def page_ranges(num_pages: int, workers: int) -> List[tuple]:
+    """Split num_pages into contiguous ranges for the worker pool"""
+    size = max(1, -(-num_pages // (workers * RANGES_PER_WORKER)))
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
 
 class PDFLoader:
-    def __init__(self, path: str):
+    def __init__(self, path: str, workers: int = 1):
         self.documents = []
         self.path = path
+        self.workers = workers
+        self.num_pages = None
         print(f"PDFLoader initialized with path: {self.path}")
 
     def load(self):
@@ -90,31 +287,52 @@ class PDFLoader:
             raise ValueError(f"Error processing file at '{self.path}': {str(e)}")
 
     def load_file(self):
+        # Extract every page (in parallel if enabled) and join the text once
+        self.documents.append("".join(self.iter_pages()))
+
+    def iter_pages(self) -> Iterator[str]:
+        """Yield the text of each page in order without building the whole document
+
+        With workers > 1, page ranges of large documents are extracted in the
+        shared process pool and yielded in page order. At most `workers`
+        ranges are in flight, so extraction never runs further ahead of a
+        slow consumer than that.
+        """
         with open(self.path, 'rb') as file:
-            # Create PDF reader object
             pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Extract text from each page
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            
-            self.documents.append(text)
+            self.num_pages = len(pdf_reader.pages)
+
+            if self.workers <= 1 or self.num_pages < PARALLEL_MIN_PAGES:
+                for page in pdf_reader.pages:
+                    yield page.extract_text() + "\n"
+                return
+
+        ranges = iter(page_ranges(self.num_pages, self.workers))
+        executor = get_extract_pool(self.workers)
+        in_flight = deque()
+        try:
+            for start, end in ranges:
+                in_flight.append(executor.submit(extract_page_range, self.path, start, end))
+                if len(in_flight) >= self.workers:
+                    break
+            while in_flight:
+                pages = in_flight.popleft().result()
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    in_flight.append(executor.submit(extract_page_range, self.path, *next_range))
+                yield from pages
+        finally:
+            # An abandoned stream must not leave queued ranges behind
+            for future in in_flight:
+                future.cancel()
 
     def load_directory(self):
         for root, _, files in os.walk(self.path):
             for file in files:
                 if file.lower().endswith('.pdf'):
                     file_path = os.path.join(root, file)
-                    with open(file_path, 'rb') as f:
-                        pdf_reader = PyPDF2.PdfReader(f)
-                        
-                        # Extract text from each page
-                        text = ""
-                        for page in pdf_reader.pages:
-                            text += page.extract_text() + "\n"
-                        
-                        self.documents.append(text)
+                    loader = PDFLoader(file_path, workers=self.workers)
+                    self.documents.append("".join(loader.iter_pages()))
 
     def load_documents(self):
         self.load()
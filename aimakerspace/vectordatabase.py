@@ -1,7 +1,14 @@
 import numpy as np
-from collections import defaultdict
-from typing import List, Tuple, Callable
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+import weakref
+from typing import List, Tuple, Callable, Dict, Optional, Any
 from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.ivf_index import IVFIndex, DEFAULT_NPROBE
 import asyncio
 
 
@@ -13,13 +20,326 @@ def cosine_similarity(vector_a: np.array, vector_b: np.array) -> float:
     return dot_product / (norm_a * norm_b)
 
 
+# Initial row capacity of the vector matrix; it doubles whenever it fills up
+INITIAL_CAPACITY = 1024
+
+# Files making up a saved database directory
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+KEYS_FILE = "keys.json"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.npy"
+CODES_FILE = "int8_codes.npy"
+SCALES_FILE = "int8_scales.npy"
+
+# Supported index types: exact brute force or IVF approximate search
+INDEX_TYPES = ("flat", "ivf")
+# An IVF index is retrained once the database grows this many times past its training size
+RETRAIN_GROWTH_FACTOR = 4
+# Supported quantization modes for the in-memory scoring matrix
+QUANTIZATION_MODES = (None, "int8")
+# Candidates rescored with float vectors per requested result
+DEFAULT_RESCORE_FACTOR = 4
+# Rows converted per matrix-vector product in int8 scoring; small enough that the
+# float block stays in CPU cache, so scoring codes costs about what a float scan does
+SCORE_BLOCK_SIZE = 256
+# Rows copied per write when moving float vectors into a row file
+COPY_BLOCK_SIZE = 16384
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: vector ~= codes * scale"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+def _close_file(file, remove_path: Optional[str]) -> None:
+    file.close()
+    if remove_path is not None:
+        try:
+            os.remove(remove_path)
+        except OSError:
+            pass
+
+
+class FloatRowFile:
+    """Float32 row matrix kept in a file instead of the heap
+
+    Rows are written and read with seek + write/readinto on an unbuffered file
+    (a lock keeps each seek paired with its transfer), so a rescoring search
+    reads only its candidate rows and none of the matrix stays mapped into the
+    process. Without a path a temporary file is created and removed with the
+    object; open_npy opens a saved .npy matrix read-only.
+    """
+
+    def __init__(self, dimension: int, path: Optional[str] = None, offset: int = 0, capacity: int = 0):
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        self.offset = offset
+        self.capacity = capacity
+        self.writable = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=".f32")
+            self._file = os.fdopen(fd, "r+b", buffering=0)
+        else:
+            self._file = open(path, "rb", buffering=0)
+        self.path = path
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _close_file, self._file, path if self.writable else None)
+
+    @classmethod
+    def open_npy(cls, path: str) -> "FloatRowFile":
+        """Read-only rows of a C-ordered float32 matrix saved with np.save"""
+        with open(path, "rb") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+        if dtype != np.float32 or fortran_order or len(shape) != 2:
+            raise ValueError(f"'{path}' is not a C-ordered float32 matrix")
+        return cls(shape[1], path=path, offset=offset, capacity=shape[0])
+
+    def resize(self, capacity: int) -> None:
+        with self._lock:
+            self._file.truncate(self.offset + capacity * self.row_bytes)
+        self.capacity = capacity
+
+    def _write_at(self, row: int, data: np.ndarray) -> None:
+        self._file.seek(self.offset + row * self.row_bytes)
+        view = memoryview(data).cast("B")
+        while view:
+            view = view[self._file.write(view):]
+
+    def _read_into(self, row: int, out: np.ndarray) -> None:
+        self._file.seek(self.offset + row * self.row_bytes)
+        view = memoryview(out).cast("B")
+        while view:
+            read = self._file.readinto(view)
+            if not read:
+                raise EOFError(f"'{self.path}' ends before row {row}")
+            view = view[read:]
+
+    def write(self, rows, vectors: np.ndarray) -> None:
+        rows = np.asarray(rows)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if len(rows) and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+                # Appended rows are contiguous and go out in a single write
+                self._write_at(int(rows[0]), vectors)
+                return
+            for row, vector in zip(rows, vectors):
+                self._write_at(int(row), vector)
+
+    def read_block(self, start: int, end: int) -> np.ndarray:
+        vectors = np.empty((end - start, self.dimension), dtype=np.float32)
+        with self._lock:
+            self._read_into(start, vectors)
+        return vectors
+
+    def read(self, rows) -> np.ndarray:
+        """Rows in the given order, one read each"""
+        vectors = np.empty((len(rows), self.dimension), dtype=np.float32)
+        with self._lock:
+            for i, row in enumerate(rows):
+                self._read_into(int(row), vectors[i])
+        return vectors
+
+    def copy_from(self, source: "FloatRowFile", rows: int) -> None:
+        for start in range(0, rows, COPY_BLOCK_SIZE):
+            end = min(start + COPY_BLOCK_SIZE, rows)
+            self.write(np.arange(start, end), source.read_block(start, end))
+
+    def view(self, rows: int) -> np.ndarray:
+        """Read-only memory-mapped view of the first rows, for whole-matrix passes"""
+        if rows == 0:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        mapped = mmap.mmap(self._file.fileno(), self.offset + rows * self.row_bytes, access=mmap.ACCESS_READ)
+        return np.frombuffer(mapped, dtype=np.float32, count=rows * self.dimension,
+                             offset=self.offset).reshape(rows, self.dimension)
+
+
 class VectorDatabase:
-    def __init__(self, embedding_model: EmbeddingModel = None):
-        self.vectors = defaultdict(np.array)
+    """In-memory vector store backed by one contiguous float32 matrix
+
+    Rows hold L2-normalized vectors so cosine similarity for every stored
+    vector is a single matrix-vector product. Keys map to rows; deletes move
+    the last row into the freed slot so the live rows stay contiguous.
+
+    With index_type="ivf" cosine searches go through an IVF index (k-means
+    coarse quantizer) once enough vectors are stored; nprobe trades recall for
+    speed and recall_report measures it against exact search. The index is
+    trained by inserts and load(), never by a search: until it is trained,
+    searches are exact.
+
+    With quantization="int8" searches score int8 codes (1 byte per dimension)
+    and rescore the best k * rescore_factor candidates with the float vectors.
+    Only the codes are held in memory: the float vectors live in a FloatRowFile
+    (a temporary file, or vectors.npy of a loaded index until its first
+    write) and only the candidate rows are read back.
+    """
+
+    def __init__(self, embedding_model: EmbeddingModel = None, index_type: str = "flat",
+                 nlist: Optional[int] = None, nprobe: int = DEFAULT_NPROBE,
+                 quantization: Optional[str] = None, rescore_factor: int = DEFAULT_RESCORE_FACTOR):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}, got '{index_type}'")
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"quantization must be one of {QUANTIZATION_MODES}, got '{quantization}'")
         self.embedding_model = embedding_model or EmbeddingModel()
+        self.index_type = index_type
+        self.ann = IVFIndex(nlist=nlist, nprobe=nprobe) if index_type == "ivf" else None
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        # An explicitly shortened embedding fixes the dimension up front, otherwise the first insert does
+        self.dimension = getattr(self.embedding_model, "dimensions", None)
+        self._matrix = None
+        self._float_rows = None
+        self._norms = None
+        self._codes = None
+        self._scales = None
+        self._keys: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The normalized vectors of all live rows"""
+        if self._float_rows is not None:
+            return self._float_rows.view(len(self._keys))
+        if self._matrix is None:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._matrix[: len(self._keys)]
+
+    def _row_fields(self) -> List[Tuple[str, tuple, type]]:
+        """Per-row heap arrays that grow, move and persist together
+
+        In int8 mode the float matrix is not one of them: it is kept in a
+        FloatRowFile and written through _write_vectors.
+        """
+        fields = [("_norms", (), np.float32)]
+        if self.quantization == "int8":
+            fields += [("_codes", (self.dimension,), np.int8), ("_scales", (), np.float32)]
+        else:
+            fields.insert(0, ("_matrix", (self.dimension,), np.float32))
+        return fields
+
+    def _resize(self, capacity: int) -> None:
+        rows = len(self._keys)
+        for name, shape, dtype in self._row_fields():
+            array = np.empty((capacity,) + shape, dtype=dtype)
+            old = getattr(self, name)
+            if old is not None and rows:
+                array[:rows] = old[:rows]
+            setattr(self, name, array)
+        if self.quantization == "int8":
+            if self._float_rows is None or not self._float_rows.writable:
+                # A loaded vectors.npy is copied into a writable row file, never into the heap
+                source = self._float_rows
+                self._float_rows = FloatRowFile(self.dimension)
+                self._float_rows.resize(capacity)
+                if source is not None:
+                    self._float_rows.copy_from(source, rows)
+            else:
+                self._float_rows.resize(capacity)
+
+    def _writable(self) -> bool:
+        if self.quantization == "int8" and (self._float_rows is None or not self._float_rows.writable):
+            return False
+        return all(getattr(self, name).flags.writeable for name, _, _ in self._row_fields())
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the matrix geometrically so appends are amortized O(1)"""
+        if self._norms is None:
+            self._resize(max(INITIAL_CAPACITY, rows))
+        elif not self._writable():
+            # A memory-mapped index is copied into the heap (or a row file) on its first write
+            self._resize(max(INITIAL_CAPACITY, rows, len(self._keys)))
+        elif rows > self._norms.shape[0]:
+            self._resize(max(rows, self._norms.shape[0] * 2))
+
+    def _write_vectors(self, rows, vectors: np.ndarray) -> None:
+        if self._float_rows is not None:
+            self._float_rows.write(rows, vectors)
+        else:
+            self._matrix[rows] = vectors
 
     def insert(self, key: str, vector: np.array) -> None:
-        self.vectors[key] = vector
+        self.insert_many([key], [vector])
+
+    def insert_many(self, keys: List[str], vectors) -> None:
+        """Insert or overwrite several vectors at once"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), -1)
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match database dimension {self.dimension}"
+            )
+
+        norms = np.linalg.norm(vectors, axis=1)
+        normalized = vectors / np.where(norms == 0, 1, norms)[:, None]
+
+        self._reserve(len(self._keys) + len(keys))
+        rows = []
+        for key, row_vector, norm in zip(keys, normalized, norms):
+            row = self._index.get(key)
+            if row is None:
+                row = len(self._keys)
+                self._index[key] = row
+                self._keys.append(key)
+            self._norms[row] = norm
+            rows.append(row)
+
+        self._write_vectors(rows, normalized)
+        if self.quantization == "int8":
+            codes, scales = quantize_int8(normalized)
+            self._codes[rows] = codes
+            self._scales[rows] = scales
+
+        if self.ann is not None:
+            self.ann.set_rows(np.array(rows), normalized)
+            self._maybe_train()
+
+    def delete(self, key: str) -> bool:
+        """Remove a key, moving the last row into its slot"""
+        if key not in self._index:
+            return False
+        self._reserve(len(self._keys))
+        row = self._index.pop(key)
+        last = len(self._keys) - 1
+        if self.ann is not None:
+            self.ann.remove_row(row)
+        if row != last:
+            last_key = self._keys[last]
+            for name, _, _ in self._row_fields():
+                array = getattr(self, name)
+                array[row] = array[last]
+            if self._float_rows is not None:
+                self._write_vectors([row], self._float_rows.read([last]))
+            self._keys[row] = last_key
+            self._index[last_key] = row
+            if self.ann is not None:
+                self.ann.move_row(last, row)
+        self._keys.pop()
+        return True
+
+    def _top_k(self, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Pick the k best rows with argpartition and sort only those"""
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[row], float(scores[row])) for row in top]
 
     def search(
         self,
@@ -27,11 +347,169 @@ class VectorDatabase:
         k: int,
         distance_measure: Callable = cosine_similarity,
     ) -> List[Tuple[str, float]]:
-        scores = [
-            (key, distance_measure(query_vector, vector))
-            for key, vector in self.vectors.items()
+        if not self._keys:
+            return []
+
+        if distance_measure is not cosine_similarity:
+            # Arbitrary measures need the original vectors, one row at a time
+            scores = np.array([
+                distance_measure(query_vector, self.retrieve_from_key(key)) for key in self._keys
+            ])
+            return self._top_k(scores, k)
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return []
+        query = query / query_norm
+
+        if self._use_ann():
+            return self._ann_search(query, k)
+        if self.quantization == "int8":
+            return self._quantized_search(query, k)
+        scores = self.matrix @ query
+        return self._top_k(scores, k)
+
+    def _code_scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate scores (codes @ query) * scale of all live rows or the given ones
+
+        Codes are converted to float one cache-sized block at a time into a
+        reused buffer, so no float copy of the code matrix is ever built.
+        """
+        n_rows = len(self._keys) if rows is None else len(rows)
+        scores = np.empty(n_rows, dtype=np.float32)
+        buffer = np.empty((SCORE_BLOCK_SIZE, self.dimension), dtype=np.float32)
+        for start in range(0, n_rows, SCORE_BLOCK_SIZE):
+            end = min(start + SCORE_BLOCK_SIZE, n_rows)
+            codes = self._codes[start:end] if rows is None else self._codes[rows[start:end]]
+            block = buffer[: end - start]
+            np.copyto(block, codes, casting="unsafe")
+            np.matmul(block, query, out=scores[start:end])
+        scores *= self._scales[:n_rows] if rows is None else self._scales[rows]
+        return scores
+
+    def _quantized_search(self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Score int8 codes of all (or the given) rows, then rescore the best candidates in float"""
+        approximate = self._code_scores(query, rows)
+        n_candidates = min(len(approximate), max(k, k * self.rescore_factor))
+        if n_candidates <= 0:
+            return []
+        candidates = np.argpartition(-approximate, n_candidates - 1)[:n_candidates]
+        if rows is not None:
+            candidates = rows[candidates]
+        candidates.sort()  # reads walk the float file in order
+
+        scores = self._float_rows.read(candidates) @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[candidates[i]], float(scores[i])) for i in top]
+
+    def _use_ann(self) -> bool:
+        """Whether searches should use the IVF index (never trains it)"""
+        return self.ann is not None and self.ann.trained
+
+    def _maybe_train(self) -> None:
+        """Train the IVF index once enough rows exist, and retrain as they keep growing
+
+        Retraining at geometric sizes keeps nlist in step with the data at an
+        amortized cost proportional to the final size.
+        """
+        rows = len(self._keys)
+        if rows < self.ann.min_train_size():
+            return
+        if not self.ann.trained or rows >= self.ann.trained_rows * RETRAIN_GROWTH_FACTOR:
+            self.train_index()
+
+    def train_index(self) -> None:
+        """(Re)train the IVF coarse quantizer on the current vectors"""
+        if self.ann is None:
+            raise ValueError("train_index requires index_type='ivf'")
+        self.ann.train(self.matrix)
+
+    def _ann_search(self, query: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        rows = self.ann.candidate_rows(query, nprobe)
+        if len(rows) == 0:
+            return []
+        if self.quantization == "int8":
+            return self._quantized_search(query, k, rows)
+        scores = self.matrix[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[rows[i]], float(scores[i])) for i in top]
+
+    def recall_report(self, queries=None, k: int = 10, nprobe_values=(1, 2, 4, 8, 16, 32),
+                      num_queries: int = 100) -> List[Dict[str, Any]]:
+        """Compare IVF search against exact search for several nprobe values
+
+        Queries default to a random sample of stored vectors. Returns one row
+        per nprobe with recall@k and mean latency of both searches in ms.
+        """
+        if not self._use_ann():
+            raise ValueError("recall_report requires a trained IVF index")
+        if queries is None:
+            rng = np.random.default_rng(0)
+            sample = rng.choice(len(self._keys), min(num_queries, len(self._keys)), replace=False)
+            queries = self.matrix[sample]
+        queries = np.asarray(queries, dtype=np.float32)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+        start = time.perf_counter()
+        exact = [{key for key, _ in self._top_k(self.matrix @ query, k)} for query in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        report = []
+        for nprobe in nprobe_values:
+            if nprobe > self.ann.nlist:
+                break
+            start = time.perf_counter()
+            approximate = [{key for key, _ in self._ann_search(query, k, nprobe)} for query in queries]
+            ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact) if e])
+            report.append({
+                "nprobe": nprobe,
+                f"recall@{k}": float(recall),
+                "ann_ms": ann_ms,
+                "exact_ms": exact_ms,
+            })
+        return report
+
+    def search_batch(self, query_vectors, k: int) -> List[List[Tuple[str, float]]]:
+        """Cosine top-k for several queries with a single matrix multiply"""
+        if not self._keys or len(query_vectors) == 0:
+            return [[] for _ in range(len(query_vectors))]
+        if self._use_ann() or self.quantization is not None:
+            # Each query probes its own lists / rescoring candidates, so these run one by one
+            return [self.search(query_vector, k) for query_vector in query_vectors]
+
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = (queries / np.where(norms == 0, 1, norms)) @ self.matrix.T
+
+        k = min(k, len(self._keys))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(self._keys[row], float(score)) for row, score in zip(rows, row_scores)]
+            for rows, row_scores in zip(top, top_scores)
         ]
-        return sorted(scores, key=lambda x: x[1], reverse=True)[:k]
+
+    def search_batch_by_text(self, query_texts: List[str], k: int,
+                             return_as_text: bool = False) -> List[List[Tuple[str, float]]]:
+        """Embed all queries in one request and search them together"""
+        query_vectors = self.embedding_model.get_embeddings(query_texts) if query_texts else []
+        results = self.search_batch(query_vectors, k)
+        return [[key for key, _ in result] for result in results] if return_as_text else results
+
+    async def asearch_batch_by_text(self, query_texts: List[str], k: int,
+                                    return_as_text: bool = False) -> List[List[Tuple[str, float]]]:
+        query_vectors = await self.embedding_model.async_get_embeddings(query_texts) if query_texts else []
+        results = self.search_batch(query_vectors, k)
+        return [[key for key, _ in result] for result in results] if return_as_text else results
 
     def search_by_text(
         self,
@@ -45,12 +523,113 @@ class VectorDatabase:
         return [result[0] for result in results] if return_as_text else results
 
     def retrieve_from_key(self, key: str) -> np.array:
-        return self.vectors.get(key, None)
+        row = self._index.get(key)
+        if row is None:
+            return None
+        if self._float_rows is not None:
+            return self._float_rows.read([row])[0] * self._norms[row]
+        return self._matrix[row] * self._norms[row]
+
+    def save(self, path: str) -> None:
+        """Write the index to a directory: a float32 .npy matrix, norms and a key sidecar
+
+        Row i of vectors.npy belongs to keys[i] in keys.json.
+        """
+        os.makedirs(path, exist_ok=True)
+        rows = len(self._keys)
+        dimension = self.dimension or 0
+        files = {
+            VECTORS_FILE: self.matrix if rows else np.empty((0, dimension), dtype=np.float32),
+            NORMS_FILE: self._norms[:rows] if rows else np.empty(0, dtype=np.float32),
+        }
+        if self.quantization == "int8":
+            files[CODES_FILE] = self._codes[:rows] if rows else np.empty((0, dimension), dtype=np.int8)
+            files[SCALES_FILE] = self._scales[:rows] if rows else np.empty(0, dtype=np.float32)
+        if self.ann is not None and self.ann.trained:
+            files[CENTROIDS_FILE], files[ASSIGNMENTS_FILE] = self.ann.state(rows)
+
+        for name, array in files.items():
+            temp_path = os.path.join(path, name + ".tmp")
+            with open(temp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temp_path, os.path.join(path, name))
+
+        temp_path = os.path.join(path, KEYS_FILE + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "dimension": self.dimension,
+                "index_type": self.index_type,
+                "nprobe": self.ann.nprobe if self.ann is not None else None,
+                "nlist": self.ann.requested_nlist if self.ann is not None else None,
+                "quantization": self.quantization,
+                "rescore_factor": self.rescore_factor,
+                "ivf_trained": bool(self.ann is not None and self.ann.trained),
+                "keys": self._keys
+            }, f)
+        os.replace(temp_path, os.path.join(path, KEYS_FILE))
+
+    @classmethod
+    def load(cls, path: str, embedding_model: EmbeddingModel = None, mmap: bool = True) -> "VectorDatabase":
+        """Open a saved index; with mmap=True the matrix is memory-mapped read-only
+
+        Memory-mapped pages are shared between processes through the OS page
+        cache, so workers open large indexes without copying them into their
+        heap. The first insert or delete copies the matrix into memory. The
+        float vectors of an int8 index are never loaded: rescoring reads its
+        candidate rows straight from vectors.npy.
+        """
+        with open(os.path.join(path, KEYS_FILE), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if sidecar.get("quantization") == "int8":
+            matrix = None
+            float_rows = FloatRowFile.open_npy(vectors_path)
+            n_vectors = float_rows.capacity
+        else:
+            matrix = np.load(vectors_path, mmap_mode=mmap_mode)
+            float_rows = None
+            n_vectors = matrix.shape[0]
+        norms = np.load(os.path.join(path, NORMS_FILE), mmap_mode=mmap_mode)
+        if n_vectors != len(sidecar["keys"]):
+            raise ValueError(f"Index at '{path}' is inconsistent: {n_vectors} vectors for {len(sidecar['keys'])} keys")
+
+        db = cls(
+            embedding_model=embedding_model,
+            index_type=sidecar.get("index_type", "flat"),
+            nlist=sidecar.get("nlist"),
+            nprobe=sidecar.get("nprobe") or DEFAULT_NPROBE,
+            quantization=sidecar.get("quantization"),
+            rescore_factor=sidecar.get("rescore_factor") or DEFAULT_RESCORE_FACTOR
+        )
+        if sidecar.get("ivf_trained"):
+            db.ann.restore(
+                np.load(os.path.join(path, CENTROIDS_FILE)),
+                np.load(os.path.join(path, ASSIGNMENTS_FILE))
+            )
+        if db.dimension is not None and sidecar["dimension"] is not None and db.dimension != sidecar["dimension"]:
+            raise ValueError(
+                f"Index at '{path}' holds {sidecar['dimension']}-dim vectors but the embedding model "
+                f"returns {db.dimension}-dim vectors"
+            )
+        db.dimension = sidecar["dimension"]
+        db._keys = list(sidecar["keys"])
+        db._index = {key: row for row, key in enumerate(db._keys)}
+        if db._keys:
+            db._matrix, db._float_rows, db._norms = matrix, float_rows, norms
+            if db.quantization == "int8":
+                # The codes are what searches scan, so they are loaded into memory
+                db._codes = np.load(os.path.join(path, CODES_FILE))
+                db._scales = np.load(os.path.join(path, SCALES_FILE))
+            if db.ann is not None:
+                # Train (or catch up on growth) here rather than on the first search
+                db._maybe_train()
+        return db
 
     async def abuild_from_list(self, list_of_text: List[str]) -> "VectorDatabase":
         embeddings = await self.embedding_model.async_get_embeddings(list_of_text)
-        for text, embedding in zip(list_of_text, embeddings):
-            self.insert(text, np.array(embedding))
+        self.insert_many(list_of_text, embeddings)
         return self
 
 
@@ -1,5 +1,5 @@
 # Import required FastAPI components for building the API
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 # Import Pydantic for data validation and settings management
@@ -12,6 +12,8 @@ import json
 import traceback
 import shutil
 import asyncio
+import hashlib
+import tempfile
 
 # Import RAG components - use relative imports to find modules in project root
 import sys
@@ -22,7 +24,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Now import the modules
 from aimakerspace.document_processor import DocumentProcessor
-from aimakerspace.rag import RAGQueryEngine
+from aimakerspace.rag import RAGQueryEngine, DEFAULT_SYSTEM_PROMPT, MIN_RELEVANCE_SCORE
+from aimakerspace.ingestion_queue import IngestionQueue, QueueFullError
+from aimakerspace.openai_utils.chatmodel import ChatOpenAI
 
 # Initialize FastAPI application with a title
 app = FastAPI(title="WODWise with RAG")
@@ -99,26 +103,49 @@ class ProcessingStatus(BaseModel):
     file_id: Optional[str] = None
     filename: Optional[str] = None
     num_chunks: Optional[int] = None
+    pages_done: Optional[int] = None
+    total_pages: Optional[int] = None
 
-# Function to process PDF in the background
-async def process_pdf_background(file_content: bytes, file_id: str, original_filename: str):
+# Function to process PDF on an ingestion worker thread (never on the event loop)
+def process_pdf_background(temp_path: str, file_id: str, original_filename: str,
+                           content_hash: Optional[str] = None, update: bool = False):
     try:
-        import tempfile
-        processing_status[file_id] = {"status": "processing", "message": "Processing PDF..."}
-        
-        # Create a temporary file to process the PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(file_content)
-            temp_path = temp_file.name
+        processing_status[file_id] = {"status": "processing", "message": "Processing PDF...", "filename": original_filename, "content_hash": content_hash}
         
         try:
             # Process the PDF using the document processor with the original filename and file_id
             print(f"Processing PDF with file_id: {file_id}, filename: {original_filename}")
-            result = document_processor.process_pdf(
-                temp_path, 
-                custom_filename=original_filename,
-                custom_file_id=file_id
-            )
+            
+            # Report pipeline progress through the status entry
+            def update_progress(progress):
+                processing_status[file_id] = {
+                    "status": "processing",
+                    "message": f"Processed {progress['pages_done']} of {progress['total_pages']} pages",
+                    "filename": original_filename,
+                    "file_id": file_id,
+                    "pages_done": progress["pages_done"],
+                    "total_pages": progress["total_pages"],
+                    "num_chunks": progress["chunks_done"],
+                    "content_hash": content_hash
+                }
+            
+            if update:
+                # A new version of a stored PDF: only changed chunks are embedded
+                result = document_processor.update_pdf(
+                    temp_path,
+                    file_id,
+                    custom_filename=original_filename,
+                    progress_callback=update_progress,
+                    content_hash=content_hash
+                )
+            else:
+                result = document_processor.process_pdf(
+                    temp_path, 
+                    custom_filename=original_filename,
+                    custom_file_id=file_id,
+                    progress_callback=update_progress,
+                    content_hash=content_hash
+                )
             
             # Ensure the filename in the result is the original filename
             result["filename"] = original_filename
@@ -129,7 +156,10 @@ async def process_pdf_background(file_content: bytes, file_id: str, original_fil
                 "message": "PDF processed successfully",
                 "filename": original_filename,
                 "file_id": file_id,  # Store file_id explicitly
-                "num_chunks": result["num_chunks"]
+                "num_chunks": result["num_chunks"],
+                "pages_done": result["num_pages"],
+                "total_pages": result["num_pages"],
+                "content_hash": content_hash
             }
         finally:
             # Always clean up the temporary file
@@ -137,7 +167,34 @@ async def process_pdf_background(file_content: bytes, file_id: str, original_fil
                 os.unlink(temp_path)
                 
     except Exception as e:
-        processing_status[file_id] = {"status": "failed", "message": str(e)}
+        processing_status[file_id] = {"status": "failed", "message": str(e), "filename": original_filename}
+        raise
+
+# Stream an upload to a temporary file while hashing it, without holding it in memory
+async def save_upload(file: UploadFile, block_size: int = 1 << 20):
+    digest = hashlib.sha256()
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+    try:
+        with temp_file:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                digest.update(block)
+                # Disk writes run off the event loop so other requests keep being served
+                await asyncio.to_thread(temp_file.write, block)
+    except BaseException:
+        # A failed or cancelled upload must not leave a partial PDF behind
+        os.unlink(temp_file.name)
+        raise
+    return temp_file.name, digest.hexdigest()
+
+# Ingestion jobs run on a fixed pool of worker threads with a bounded queue
+ingestion_queue = IngestionQueue(
+    process_pdf_background,
+    num_workers=int(os.environ.get("INGESTION_WORKERS", 2)),
+    max_queue_size=int(os.environ.get("INGESTION_QUEUE_SIZE", 16))
+)
 
 # Define the main chat endpoint that handles POST requests
 @app.post("/api/chat")
@@ -167,30 +224,27 @@ async def chat(request: ChatRequest):
                 except Exception as e:
                     yield f"Error: {str(e)}__STREAM_COMPLETE__"  # Include completion marker even on error
         else:
-            # Use the standard OpenAI chat completion
-            from openai import OpenAI
-            
-            # Initialize OpenAI client with the API key
-            client = OpenAI(api_key=api_key)
+            # Use the standard OpenAI chat completion; the server's key streams on the pooled
+            # async client, a key sent with the request on a client closed after the stream
+            chat_model = ChatOpenAI(model_name=request.model, api_key=api_key)
             
             # Create an async generator function for streaming responses
             async def generate():
                 try:
                     # Create a streaming chat completion request
-                    stream = client.chat.completions.create(
-                        model=request.model,
-                        messages=[
+                    stream = chat_model.astream(
+                        [
                             {"role": "system", "content": request.developer_message},
                             {"role": "user", "content": request.user_message}
                         ],
-                        stream=True,  # Enable streaming response
                         max_tokens=1000  # Limit token count to prevent long responses
                     )
                     
-                    # Yield each chunk of the response as it becomes available
-                    for chunk in stream:
-                        if chunk.choices[0].delta.content is not None:
-                            yield chunk.choices[0].delta.content
+                    # Yield each chunk of the response as it becomes available. On a client
+                    # disconnect StreamingResponse cancels this generator, and astream closes
+                    # the upstream stream in its finally block
+                    async for chunk in stream:
+                        yield chunk
                     
                     # Send an explicit completion marker that the frontend will recognize
                     yield "__STREAM_COMPLETE__"
@@ -214,72 +268,100 @@ async def chat(request: ChatRequest):
 
 # Endpoint to upload a PDF file
 @app.post("/api/upload-pdf")
-async def upload_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...)):
+    temp_path = None
+    submitted = False
     try:
         # Get the original filename
         original_filename = file.filename
         
-        # Check if a file with the same name already exists in Qdrant
-        from aimakerspace.qdrant_store import QdrantVectorStore
-        vector_store = QdrantVectorStore()
-        existing_pdfs = vector_store.get_all_pdf_metadata()
-        
-        # Check for files with the same name
-        for pdf in existing_pdfs:
-            if pdf.get("filename") == original_filename:
-                # File already exists
-                existing_file_id = pdf.get("file_id")
-                
-                return {
-                    "file_id": existing_file_id, 
-                    "status": "already_exists", 
-                    "message": f"PDF '{original_filename}' was already uploaded and processed.",
-                    "filename": original_filename,
-                    "num_chunks": pdf.get('num_chunks', 0)
-                }
+        # Hash the upload while spooling it to disk
+        temp_path, content_hash = await save_upload(file)
+        catalog = document_processor.vector_store.catalog
+        
+        # Identical content (under any name) was already ingested: short-circuit
+        existing = catalog.find_by_hash(content_hash)
+        if existing is None:
+            # Also catch an identical upload that is still waiting or processing; iterate over a
+            # snapshot because ingestion worker threads add and remove entries concurrently
+            for pending_id, status_data in list(processing_status.items()):
+                if status_data.get("content_hash") == content_hash and status_data.get("status") == "processing":
+                    existing = {"file_id": pending_id, "filename": status_data.get("filename"), "num_chunks": status_data.get("num_chunks", 0)}
+                    break
+        if existing is not None:
+            return {
+                "file_id": existing.get("file_id"),
+                "status": "already_exists",
+                "message": f"PDF '{original_filename}' was already uploaded and processed as '{existing.get('filename')}'.",
+                "filename": existing.get("filename"),
+                "num_chunks": existing.get("num_chunks", 0)
+            }
         
-        # Generate a unique ID for this upload
-        file_id = str(uuid.uuid4())
+        # Same name with different content: update the stored document in place
+        previous = catalog.find_by_filename(original_filename)
+        update = bool(previous)
+        if update and (processing_status.get(previous[0].get("file_id")) or {}).get("status") == "processing":
+            raise HTTPException(status_code=409, detail=f"PDF '{original_filename}' is already being processed")
         
-        # Read the file content
-        file_content = await file.read()
+        # Reuse the stored document's id for updates, otherwise generate a unique ID for this upload
+        file_id = previous[0]["file_id"] if update else str(uuid.uuid4())
         
-        # Process the PDF in the background using temporary storage
-        background_tasks.add_task(process_pdf_background, file_content, file_id, original_filename)
+        # Hand the PDF to the ingestion workers; reject with 429 when they are saturated
+        previous_status = processing_status.get(file_id)
+        processing_status[file_id] = {"status": "processing", "message": "Waiting for an ingestion worker", "filename": original_filename, "content_hash": content_hash}
+        try:
+            ingestion_queue.submit(file_id, temp_path, file_id, original_filename, content_hash, update)
+        except QueueFullError as e:
+            # A rejected update leaves the stored document (and its last status) as it was
+            if previous_status is not None:
+                processing_status[file_id] = previous_status
+            else:
+                processing_status.pop(file_id, None)
+            raise HTTPException(status_code=429, detail=str(e))
+        # From here on the ingestion worker owns (and removes) the temp file
+        submitted = True
         
+        if update:
+            return {"file_id": file_id, "status": "processing", "message": "PDF content changed, updating changed sections"}
         return {"file_id": file_id, "status": "processing", "message": "PDF upload started"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in upload_pdf: {str(e)}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Every path that does not hand the PDF to a worker removes it here
+        if temp_path is not None and not submitted and os.path.exists(temp_path):
+            os.unlink(temp_path)
 
 # Endpoint to check the status of PDF processing
 @app.get("/api/pdf-status/{file_id}")
 async def pdf_status(file_id: str):
     try:
         # First check if we have the status in our processing dictionary
-        if file_id in processing_status:
-            return processing_status[file_id]
-        
-        # If not found in processing_status, check if it exists in Qdrant
+        status = processing_status.get(file_id)
+        if status is not None:
+            status = dict(status)
+            job = ingestion_queue.job(file_id)
+            if job:
+                status["timing"] = {key: job[key] for key in ("wait_seconds", "run_seconds")}
+            return status
+        
+        # If not found in processing_status, check the document catalog
         # This handles cases where processing completed but status was lost
         # (e.g., after server restart)
-        from aimakerspace.qdrant_store import QdrantVectorStore
-        vector_store = QdrantVectorStore()
-        existing_pdfs = vector_store.get_all_pdf_metadata()
-        
-        # Check if the file_id exists in Qdrant
-        for pdf in existing_pdfs:
-            if pdf.get("file_id") == file_id:
-                # File exists in Qdrant, so it's been processed successfully
-                return {
-                    "file_id": file_id,
-                    "status": "completed",
-                    "message": "PDF processing complete",
-                    "filename": pdf.get("filename", "Unknown"),
-                    "num_chunks": pdf.get("num_chunks", 0)
-                }
+        pdf = document_processor.vector_store.get_pdf_metadata(file_id)
+        if pdf:
+            status = pdf.get("status", "completed")
+            return {
+                "file_id": file_id,
+                "status": status,
+                "message": "PDF processing complete" if status == "completed" else f"PDF status: {status}",
+                "filename": pdf.get("filename", "Unknown"),
+                "num_chunks": pdf.get("num_chunks", 0)
+            }
         
         # If we get here, the file_id was not found anywhere
         return {"status": "not_found", "message": "PDF processing status not found"}
@@ -289,7 +371,31 @@ async def pdf_status(file_id: str):
 # Debug endpoint to check all processing statuses
 @app.get("/api/debug/processing-status")
 async def debug_processing_status():
-    return {"processing_status": processing_status}
+    return {"processing_status": dict(processing_status)}
+
+# Debug endpoint to check ingestion queue depth and worker activity
+@app.get("/api/debug/ingestion-queue")
+async def debug_ingestion_queue():
+    return {"ingestion_queue": ingestion_queue.stats()}
+
+# Repair endpoint to rebuild the document catalog from a full scan of the chunks
+@app.post("/api/debug/rebuild-catalog")
+async def debug_rebuild_catalog():
+    num_documents = await asyncio.to_thread(document_processor.vector_store.rebuild_catalog)
+    return {"success": True, "num_documents": num_documents}
+
+# Debug endpoint to check embedding cache hit/miss counters
+@app.get("/api/debug/embedding-cache")
+async def debug_embedding_cache():
+    from aimakerspace.openai_utils.embedding import get_default_cache
+    cache = get_default_cache()
+    return {"embedding_cache": cache.stats() if cache else None}
+
+# Debug endpoint to check semantic answer cache hit/miss counters
+@app.get("/api/debug/answer-cache")
+async def debug_answer_cache():
+    cache = rag_engine.answer_cache
+    return {"answer_cache": cache.stats() if cache else None}
 
 # Endpoint to list all available PDFs
 @app.get("/api/list-pdfs")
@@ -298,10 +404,8 @@ async def list_pdfs():
         # Use a dictionary to track PDFs by file_id to prevent duplicates
         pdf_dict = {}
         
-        # Get PDFs from Qdrant Cloud
-        from aimakerspace.qdrant_store import QdrantVectorStore
-        vector_store = QdrantVectorStore()
-        qdrant_pdfs = vector_store.get_all_pdf_metadata()
+        # Get PDFs from the document catalog
+        qdrant_pdfs = document_processor.vector_store.get_all_pdf_metadata()
         
         if qdrant_pdfs:
             # Ensure all PDFs have the required fields
@@ -316,11 +420,12 @@ async def list_pdfs():
                     "file_id": file_id,
                     "filename": pdf.get("filename", "Unknown PDF"),
                     "num_chunks": pdf.get("num_chunks", 0),
-                    "status": "completed"  # If it's in Qdrant, it's completed
+                    "status": pdf.get("status", "completed")
                 }
         
         # Include any PDFs that are currently being processed but not yet in Qdrant
-        for file_id, status_data in processing_status.items():
+        # (a snapshot: ingestion worker threads update the dict concurrently)
+        for file_id, status_data in list(processing_status.items()):
             # Only add if not already in our dictionary
             if file_id not in pdf_dict:
                 pdf_dict[file_id] = {
@@ -346,8 +451,8 @@ async def list_pdfs():
 @app.post("/api/rag-query")
 async def rag_query(request: RAGRequest):
     try:
-        # Get search results directly - limit to top 5 results to ensure we get enough distinct sources
-        search_results = await rag_engine.vector_store.asimilarity_search(request.query, k=5)
+        # Over-fetch, dedup by file_id/chunk_index and diversify with MMR down to the engine's k
+        search_results = await rag_engine.asearch(request.query)
         
         # If no relevant PDF content is found, return a clear message
         if not search_results or len(search_results) == 0:
@@ -357,118 +462,45 @@ async def rag_query(request: RAGRequest):
             }
             
         # Calculate average relevance score
-        if search_results:
-            relevance_scores = [result.get("score", 0) for result in search_results]
-            relevance_percentage = int(sum(relevance_scores) / len(relevance_scores) * 100) if relevance_scores else 0
-        else:
-            relevance_percentage = 0
+        relevance_scores = [result.get("score", 0) for result in search_results]
+        relevance_percentage = int(sum(relevance_scores) / len(relevance_scores) * 100)
         
-        # If relevance is below threshold, return a message indicating no relevant content
-        if relevance_percentage < 50 or not search_results:
+        # Only refuse if ALL scores are below threshold, as the streaming endpoint does
+        if max(relevance_scores) < MIN_RELEVANCE_SCORE:
             return {
                 "answer": f"I don't have enough relevant information in the uploaded PDF to answer this question. (Relevance: {relevance_percentage}%)",
                 "sources": [],
                 "relevance": relevance_percentage
             }
         
-        # Format context from search results manually
-        context_parts = []
-        sources = []
+        # Sources from the (already unique and diverse) results
+        sources = [{
+            "text": result["text"],
+            "source": result["source"],
+            "score": result.get("score", 0)
+        } for result in search_results]
         
-        # Sort search results by score (highest first)
-        search_results = sorted(search_results, key=lambda x: x.get('score', 0), reverse=True)
+        # Show the sources by score
+        sources.sort(key=lambda x: x.get('score', 0), reverse=True)
         
-        for i, result in enumerate(search_results):
-            try:
-                # Extract text and score
-                text = result.get("text", "")
-                score = result.get("score", 0)
-                
-                # Extract source with proper fallback handling
-                source = result.get("source", "Unknown")
-                
-                # Add to context parts for the prompt
-                context_parts.append(f"[Document {i+1}] Source: {source}\n{text}\n")
-                
-                # Add to sources for the response
-                source_item = {
-                    "text": text,
-                    "source": source,
-                    "score": score
-                }
-                sources.append(source_item)
-                print(f"Added source: {source} with score {score:.2f}")
-                
-            except Exception as e:
-                pass
-        
-        # Find diverse sources by looking at different sections
-        # First, group sources by their base filename (without section number)
-        source_groups = {}
-        for source in sources:
-            # Extract just the filename without the section number
-            source_name = source['source'].split(' (Section')[0] if ' (Section' in source['source'] else source['source']
-            
-            if source_name not in source_groups:
-                source_groups[source_name] = []
-            source_groups[source_name].append(source)
-        
-        # For each group, find sources from different sections if possible
-        final_sources = []
-        seen_texts = set()
-        
-        # First, add the highest scoring source from each group
-        for source_name, group_sources in source_groups.items():
-            # Sort by score descending
-            group_sources.sort(key=lambda x: x.get('score', 0), reverse=True)
-            
-            # Add the highest scoring source
-            best_source = group_sources[0]
-            text_fingerprint = best_source['text'][:100]
-            seen_texts.add(text_fingerprint)
-            final_sources.append(best_source)
-        
-        # If we have fewer than 3 sources and there are multiple sections in the same document,
-        # try to add sources from different sections
-        if len(final_sources) < 3:
-            # Find sources with different section numbers
-            for source_name, group_sources in source_groups.items():
-                if len(final_sources) >= 3:
-                    break
-                    
-                # Try to find sources from different sections
-                for source in group_sources:
-                    if len(final_sources) >= 3:
-                        break
-                        
-                    text_fingerprint = source['text'][:100]
-                    if text_fingerprint not in seen_texts:
-                        seen_texts.add(text_fingerprint)
-                        final_sources.append(source)
-        
-        # Sort final sources by score
-        final_sources.sort(key=lambda x: x.get('score', 0), reverse=True)
-        
-        # Replace with unique sources
-        sources = final_sources
-        print(f"After source selection: {len(sources)} diverse sources")
-        
-        # Join context parts
-        context = "\n".join(context_parts)
+        # Merge overlapping chunks and fit the context into the engine's token budget
+        built = rag_engine.build_context(search_results)
+        context = built["context"]
         
         # Create messages for the chat model
         messages = [
-            {"role": "system", "content": request.system_prompt or rag_engine.system_prompt},
+            {"role": "system", "content": request.system_prompt or DEFAULT_SYSTEM_PROMPT},
             {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {request.query}\n\nAnswer:"}
         ]
         
-        # Get response from chat model
-        response = rag_engine.chat_model.run(messages)
+        # Await the response on the async client so other requests keep being served
+        response = await rag_engine.chat_model.arun(messages)
         
         # Create a response with consistent format
         response_data = {
             "answer": response,
-            "sources": sources
+            "sources": sources,
+            "context_tokens": built["tokens"]
         }
         
 
@@ -494,87 +526,13 @@ async def rag_stream(request: Request):
         query = data.get("query", "")
         system_prompt = data.get("system_prompt", None)
         
-        # First get sources to return them separately
-        search_results = await rag_engine.vector_store.asimilarity_search(query, k=5)
-        print(f"RAG stream endpoint: found {len(search_results)} sources")
+        # Retrieve once; the same results feed the sources message and the answer stream
+        retrieval = await rag_engine.aretrieve(query, system_prompt)
+        sources = list(retrieval["sources"])
+        print(f"RAG stream endpoint: found {len(sources)} sources")
         
-        # Extract sources with proper metadata handling
-        sources = []
-        for result in search_results:
-            # Extract text and score
-            text = result.get("text", "")
-            score = result.get("score", 0)
-            
-            # Extract source with proper fallback handling
-            if "metadata" in result and isinstance(result["metadata"], dict):
-                source = result["metadata"].get("source", result.get("source", "Unknown"))
-            else:
-                source = result.get("source", "Unknown")
-                
-            sources.append({
-                "text": text,
-                "source": source,
-                "score": score
-            })
-        
-        # Sort sources by score (highest first) and limit to top 5
-        sources = sorted(sources, key=lambda x: x.get("score", 0), reverse=True)[:5]
-        print(f"Prepared {len(sources)} sources for response")
-        
-        # Log each source to check for duplicates
-        for i, source in enumerate(sources):
-            print(f"Source {i}: {source['source']}, Score: {source['score']}, Text: {source['text'][:30]}...")
-            
-        # Find diverse sources by looking at different sections
-        # First, group sources by their base filename (without section number)
-        source_groups = {}
-        for source in sources:
-            # Extract just the filename without the section number
-            source_name = source['source'].split(' (Section')[0] if ' (Section' in source['source'] else source['source']
-            
-            if source_name not in source_groups:
-                source_groups[source_name] = []
-            source_groups[source_name].append(source)
-        
-        # For each group, find sources from different sections if possible
-        final_sources = []
-        seen_texts = set()
-        
-        # First, add the highest scoring source from each group
-        for source_name, group_sources in source_groups.items():
-            # Sort by score descending
-            group_sources.sort(key=lambda x: x.get('score', 0), reverse=True)
-            
-            # Add the highest scoring source
-            best_source = group_sources[0]
-            text_fingerprint = best_source['text'][:100]
-            seen_texts.add(text_fingerprint)
-            final_sources.append(best_source)
-        
-        # If we have fewer than 3 sources and there are multiple sections in the same document,
-        # try to add sources from different sections
-        if len(final_sources) < 3:
-            # Find sources with different section numbers
-            for source_name, group_sources in source_groups.items():
-                if len(final_sources) >= 3:
-                    break
-                    
-                # Try to find sources from different sections
-                for source in group_sources:
-                    if len(final_sources) >= 3:
-                        break
-                        
-                    text_fingerprint = source['text'][:100]
-                    if text_fingerprint not in seen_texts:
-                        seen_texts.add(text_fingerprint)
-                        final_sources.append(source)
-        
-        # Sort final sources by score
-        final_sources.sort(key=lambda x: x.get('score', 0), reverse=True)
-        
-        # Replace with unique sources
-        sources = final_sources
-        print(f"After deduplication: {len(sources)} unique sources")
+        # Sources are already deduplicated and diversified by the engine; show them by score
+        sources.sort(key=lambda x: x.get("score", 0), reverse=True)
         
         # Create response headers
         headers = {
@@ -593,7 +551,7 @@ async def rag_stream(request: Request):
                 
                 # Then stream the actual response
                 # Use the trainer persona directly from the frontend
-                async for chunk in rag_engine.astream_query(query, system_prompt):
+                async for chunk in rag_engine.astream_retrieved(retrieval):
                     yield f"data: {chunk}\n\n"
                 
                 # Add completion marker
@@ -616,20 +574,15 @@ async def delete_pdf(file_id: str):
     try:
         print(f"DEBUG: Deleting PDF with file_id: {file_id}")
         
-        # First check if this PDF exists in our list
-        from aimakerspace.qdrant_store import QdrantVectorStore
-        vector_store = QdrantVectorStore()
-        
-        # Get all PDFs to check if this one exists
-        all_pdfs = vector_store.get_all_pdf_metadata()
-        pdf_exists = any(pdf.get("file_id") == file_id for pdf in all_pdfs)
+        # First check if this PDF exists in the document catalog
+        vector_store = document_processor.vector_store
+        pdf_exists = vector_store.get_pdf_metadata(file_id) is not None
         
         if not pdf_exists:
             print(f"DEBUG: PDF with file_id {file_id} not found in metadata list")
             # Check if it's in processing status
-            if file_id in processing_status:
-                print(f"DEBUG: PDF {file_id} found in processing_status, removing it")
-                del processing_status[file_id]
+            if processing_status.pop(file_id, None) is not None:
+                print(f"DEBUG: PDF {file_id} found in processing_status, removed it")
                 return {"success": True, "message": "PDF removed from processing status"}
             else:
                 print(f"DEBUG: PDF {file_id} not found anywhere")
@@ -637,11 +590,10 @@ async def delete_pdf(file_id: str):
         
         # Delete PDF from Qdrant Cloud
         print(f"DEBUG: Attempting to delete PDF {file_id} from vector store")
-        success = vector_store.delete_pdf_by_file_id(file_id)
+        success = document_processor.delete_pdf(file_id)
         
         # Remove from processing status if present
-        if file_id in processing_status:
-            del processing_status[file_id]
+        if processing_status.pop(file_id, None) is not None:
             print(f"DEBUG: Removed {file_id} from processing_status")
         
         if success: